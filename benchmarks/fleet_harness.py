@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Arnés local para el modo flota: varias instancias falsas de n8n en puertos distintos
+
+Levanta N servidores stub (ver stub_n8n_server.py), genera un inventario que
+apunta a ellos y ejecuta `n8n_guardian.py fleet`. Cada instancia usa los
+ejecutables falsos de stubs.py con su propia latencia y versión de n8n, e
+incluye una instancia caída para comprobar el manejo de errores.
+
+Uso:
+    python benchmarks/fleet_harness.py --instances 12 --parallel 4
+"""
+
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(BENCH_DIR))
+
+import stubs  # noqa: E402
+from stub_n8n_server import StubN8NServer  # noqa: E402
+
+
+def unused_port():
+    """Puerto local libre (para simular una instancia caída)"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Arnés local del modo flota de N8N Guardian")
+    parser.add_argument("--instances", type=int, default=6, help="Instancias falsas a levantar")
+    parser.add_argument("--parallel", type=int, default=4, help="Paralelismo del guardian")
+    parser.add_argument("--max-latency", type=float, default=0.3,
+                        help="Latencia máxima simulada de node/npm/n8n por instancia (s)")
+    parser.add_argument("--checks", help="Chequeos a ejecutar (por defecto todos)")
+    parser.add_argument("--keep", action="store_true", help="No borrar el directorio temporal")
+    args = parser.parse_args(argv)
+
+    workdir = Path(tempfile.mkdtemp(prefix="n8n_guardian_fleet_"))
+    bin_dir = stubs.create_stub_bin(workdir / "bin")
+    audit_file = workdir / "audit_report.json"
+    audit_file.write_text(stubs.synthetic_audit_json(3), encoding="utf-8")
+
+    servers = []
+    instances = []
+    rng = random.Random(42)
+    try:
+        for i in range(args.instances):
+            server = StubN8NServer(latency=rng.uniform(0, 0.02)).start()
+            servers.append(server)
+            latency = round(rng.uniform(0, args.max_latency), 3)
+            version = "1.93.0" if i % 3 else "1.80.1"
+            env = f"GUARDIAN_STUB_LATENCY={latency} GUARDIAN_STUB_N8N_VERSION={version}"
+            if i % 4 == 1:
+                env += f" GUARDIAN_STUB_AUDIT_FILE={audit_file}"
+            instances.append({
+                "name": f"stub-{i + 1}",
+                "url": server.url,
+                # Un prefijo 'env' hace las veces de 'ssh host' para cada instancia
+                "command_prefix": f"env {env}",
+            })
+        instances.append({"name": "caida", "url": f"http://127.0.0.1:{unused_port()}", "command_prefix": "env"})
+
+        inventory = workdir / "inventory.json"
+        inventory.write_text(json.dumps({
+            "defaults": {"parallel": args.parallel, "timeout_s": 30},
+            "instances": instances,
+        }, indent=2), encoding="utf-8")
+        print(f"🧪 Inventario con {len(instances)} instancias: {inventory}", file=sys.stderr)
+
+        env = dict(os.environ, **stubs.stub_environment(bin_dir))
+        if servers:
+            # El primer stub también hace de registro npm para la versión 'latest'
+            env["npm_config_registry"] = servers[0].url
+        command = [sys.executable, str(REPO_ROOT / "n8n_guardian.py"), "fleet", "--inventory", str(inventory),
+                   "--json", str(workdir / "fleet_report.json")]
+        if args.checks:
+            command += ["--checks", args.checks]
+        result = subprocess.run(command, cwd=str(workdir), env=env)
+        print(f"📄 Reporte: {workdir / 'fleet_report.json'} (código de salida {result.returncode})", file=sys.stderr)
+        return result.returncode
+    finally:
+        for server in servers:
+            server.stop()
+        if not args.keep:
+            import shutil
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmarks de los caminos críticos de N8N Guardian
+
+Se ejecutan sin red contra ejecutables falsos de node/npm/n8n (ver stubs.py)
+y emiten los resultados en JSON para poder detectar regresiones en CI.
+
+Uso:
+    python benchmarks/run_benchmarks.py --output bench.json
+    python benchmarks/run_benchmarks.py --log-size-mb 2048 --only show_recent_logs
+"""
+
+import argparse
+import asyncio
+import builtins
+import contextlib
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(BENCH_DIR))
+
+import stubs  # noqa: E402
+from stub_n8n_server import StubN8NServer  # noqa: E402
+
+
+def summarize(durations, cpu_durations=None, **extra):
+    """Resumen estadístico de una lista de duraciones en segundos"""
+    summary = {
+        "runs": len(durations),
+        "min_s": min(durations),
+        "median_s": statistics.median(durations),
+        "mean_s": statistics.mean(durations),
+        "max_s": max(durations),
+    }
+    if cpu_durations:
+        summary["cpu_median_s"] = statistics.median(cpu_durations)
+    summary.update(extra)
+    return summary
+
+
+def measure(fn, repeat):
+    """Ejecutar `fn` `repeat` veces y devolver (tiempos de pared, tiempos de CPU)"""
+    wall, cpu = [], []
+    for _ in range(repeat):
+        cpu_start = time.process_time()
+        start = time.perf_counter()
+        fn()
+        wall.append(time.perf_counter() - start)
+        cpu.append(time.process_time() - cpu_start)
+    return wall, cpu
+
+
+def write_large_log(path, size_bytes):
+    """Generar un log con el formato del guardian de aproximadamente `size_bytes`"""
+    line = "2025-05-24 12:00:00,000 [INFO] n8n funcionando correctamente - latido de monitoreo\n"
+    block = (line * (1024 * 1024 // len(line))).encode("utf-8")
+    written = 0
+    with open(path, "wb") as f:
+        while written < size_bytes:
+            f.write(block)
+            written += len(block)
+    return written
+
+
+class BenchmarkSuite:
+    def __init__(self, args, workdir):
+        self.args = args
+        self.workdir = Path(workdir)
+        self.devnull = open(os.devnull, "w", encoding="utf-8")
+        self.bin_dir = stubs.create_stub_bin(self.workdir / "bin")
+        self.audit_file = self.workdir / "audit_report.txt"
+        os.environ.update(stubs.stub_environment(
+            self.bin_dir,
+            latency=args.latency,
+            output_bytes=args.output_bytes,
+        ))
+        # Registro npm falso: el chequeo de versión no debe salir a la red
+        self.registry_server = StubN8NServer().start()
+        os.environ["npm_config_registry"] = self.registry_server.url
+        os.chdir(self.workdir)
+
+        with self.quiet():
+            import n8n_guardian
+            self.module = n8n_guardian
+            self.guardian = n8n_guardian.N8NGuardian()
+            self.guardian.logger  # configurar los handlers antes de silenciarlos
+
+        # El StreamHandler de logging guarda su propio stream: silenciarlo también
+        for handler in logging.getLogger().handlers:
+            if type(handler) is logging.StreamHandler:
+                handler.setStream(self.devnull)
+
+    @contextlib.contextmanager
+    def quiet(self):
+        with contextlib.redirect_stdout(self.devnull), contextlib.redirect_stderr(self.devnull):
+            yield
+
+    def bench_run_preflight(self):
+        """run() completo hasta la pregunta de inicio (respondiendo 'N')"""
+        original_input = builtins.input
+        builtins.input = lambda prompt="": "n"
+        try:
+            with self.quiet():
+                wall, cpu = measure(self.guardian.run, self.args.repeat)
+        finally:
+            builtins.input = original_input
+        return summarize(wall, cpu, stub_latency_s=self.args.latency)
+
+    def bench_security_audit(self):
+        """security_audit() con un reporte sintético grande de npm audit"""
+        report = stubs.synthetic_audit_report(int(self.args.audit_size_mb * 1024 * 1024))
+        self.audit_file.write_text(report, encoding="utf-8")
+        os.environ["GUARDIAN_STUB_AUDIT_FILE"] = str(self.audit_file)
+        try:
+            with self.quiet():
+                wall, cpu = measure(self.guardian.security_audit, self.args.repeat)
+        finally:
+            os.environ.pop("GUARDIAN_STUB_AUDIT_FILE", None)
+        return summarize(wall, cpu, report_bytes=len(report))
+
+    def bench_analyze_vulnerabilities(self):
+        """analyze_vulnerabilities() sobre el mismo reporte, sin subprocesos"""
+        report = stubs.synthetic_audit_report(int(self.args.audit_size_mb * 1024 * 1024))
+        with self.quiet():
+            wall, cpu = measure(lambda: self.guardian.analyze_vulnerabilities(report), self.args.repeat)
+        return summarize(wall, cpu, report_bytes=len(report),
+                         mb_per_s=len(report) / 1e6 / statistics.median(wall))
+
+    def bench_show_recent_logs(self):
+        """show_recent_logs() sobre un log principal de varios MB/GB"""
+        big_log = self.workdir / "big_guardian.log"
+        size = write_large_log(big_log, int(self.args.log_size_mb * 1024 * 1024))
+        original_log = self.guardian.log_file
+        self.guardian.log_file = big_log
+        try:
+            with self.quiet():
+                wall, cpu = measure(self.guardian.show_recent_logs, self.args.repeat)
+        finally:
+            self.guardian.log_file = original_log
+            big_log.unlink()
+        return summarize(wall, cpu, log_bytes=size)
+
+    def bench_version_check(self):
+        """get_latest_n8n_version(): descarga, revalidación con ETag y caché fresca"""
+        server = StubN8NServer().start()
+        original_registry = self.guardian.registry
+        registry = self.module.RegistryClient(server.url, self.workdir / "registry_cache.json")
+        self.guardian.registry = registry
+        results = {}
+        try:
+            for mode in ("fetched", "revalidated", "cache"):
+                def check():
+                    if mode == "fetched" and registry.cache_file.exists():
+                        registry.cache_file.unlink()
+                    registry.ttl_s = 0 if mode == "revalidated" else 3600
+                    self.guardian.get_latest_n8n_version()
+                check()  # calentar la caché para los modos siguientes
+                with self.quiet():
+                    wall, cpu = measure(check, self.args.repeat)
+                results[mode] = summarize(wall, cpu)
+        finally:
+            self.guardian.registry = original_registry
+            server.stop()
+        results["registry_fetches"] = server.registry_fetches
+        results["registry_revalidations"] = server.registry_revalidations
+        return results
+
+    def bench_log_and_print(self):
+        """Throughput de log_and_print (consola + archivo)"""
+        count = self.args.log_messages
+
+        def emit():
+            for i in range(count):
+                self.guardian.log_and_print(f"✅ Mensaje de benchmark {i}", "success")
+
+        with self.quiet():
+            wall, cpu = measure(emit, self.args.repeat)
+        return summarize(wall, cpu, messages=count,
+                         messages_per_s=count / statistics.median(wall))
+
+    def bench_monitor_loop(self):
+        """CPU del núcleo de supervisión asyncio (sondas HTTP + muestreo /proc) por iteración
+
+        El stub HTTP corre en este mismo proceso, así que su CPU también se cuenta.
+        """
+        seconds = self.args.monitor_seconds
+        interval = self.args.monitor_interval
+        server = StubN8NServer().start()
+        original_url = self.guardian.n8n_url
+        self.guardian.n8n_url = server.url
+        self.guardian.config.update({
+            "startup_grace_s": 0.2,
+            "probe_interval_s": interval,
+            "sample_interval_s": interval,
+        })
+
+        async def supervised():
+            task = asyncio.ensure_future(self.guardian.supervise(interactive=False))
+            await asyncio.sleep(seconds)
+            self.guardian.stop_n8n()
+            return await task
+
+        samples_before = self.guardian.samples_taken
+        probes_before = server.requests
+        try:
+            with self.quiet():
+                wall, cpu = measure(lambda: asyncio.run(supervised()), self.args.repeat)
+        finally:
+            self.guardian.n8n_url = original_url
+            server.stop()
+        samples = (self.guardian.samples_taken - samples_before) / self.args.repeat
+        probes = (server.requests - probes_before) / self.args.repeat
+        cpu_median = statistics.median(cpu)
+        return summarize(wall, cpu, supervised_s=seconds, interval_s=interval,
+                         samples_per_run=samples, probes_per_run=probes,
+                         cpu_per_iteration_s=cpu_median / max(samples + probes, 1),
+                         threads=threading.active_count())
+
+    def close(self):
+        self.registry_server.stop()
+        self.devnull.close()
+
+
+BENCHMARKS = (
+    "run_preflight",
+    "security_audit",
+    "analyze_vulnerabilities",
+    "version_check",
+    "show_recent_logs",
+    "log_and_print",
+    "monitor_loop",
+)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks offline de N8N Guardian")
+    parser.add_argument("--output", "-o", help="Archivo JSON de salida (por defecto stdout)")
+    parser.add_argument("--only", action="append", choices=BENCHMARKS,
+                        help="Ejecutar solo este benchmark (repetible)")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones por benchmark")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="Latencia simulada de cada invocación de node/npm/n8n (s)")
+    parser.add_argument("--output-bytes", type=int, default=0,
+                        help="Relleno en la salida de npm list y n8n (bytes)")
+    parser.add_argument("--audit-size-mb", type=float, default=4.0,
+                        help="Tamaño del reporte sintético de npm audit")
+    parser.add_argument("--log-size-mb", type=float, default=64.0,
+                        help="Tamaño del log para show_recent_logs (usa 2048+ para multi-GB)")
+    parser.add_argument("--log-messages", type=int, default=5000,
+                        help="Mensajes por repetición para log_and_print")
+    parser.add_argument("--monitor-seconds", type=float, default=3.0,
+                        help="Segundos de supervisión medidos por repetición")
+    parser.add_argument("--monitor-interval", type=float, default=0.01,
+                        help="Intervalo de sondas y muestreo durante el benchmark (s)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    selected = args.only or list(BENCHMARKS)
+    original_cwd = os.getcwd()
+    results = {}
+
+    with tempfile.TemporaryDirectory(prefix="n8n_guardian_bench_") as workdir:
+        suite = BenchmarkSuite(args, workdir)
+        try:
+            for name in selected:
+                print(f"⏱️  {name}...", file=sys.stderr)
+                results[name] = getattr(suite, f"bench_{name}")()
+        finally:
+            suite.close()
+            os.chdir(original_cwd)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": vars(args),
+        },
+        "results": results,
+    }
+    payload = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(payload + "\n", encoding="utf-8")
+        print(f"📄 Resultados guardados en {args.output}", file=sys.stderr)
+    else:
+        print(payload)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
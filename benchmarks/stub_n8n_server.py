@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Servidor HTTP falso que imita los endpoints de n8n usados por el guardian
+
+Rutas:
+    GET/POST /webhook/<ruta>       Respuesta JSON tras la latencia configurada
+    GET/POST /webhook-test/<ruta>  Igual que /webhook/
+    GET      /healthz              {"status": "ok"}
+    GET      /-/package/<pkg>/dist-tags  Registro npm falso: {"latest": ...} con ETag / 304
+
+Uso:
+    python benchmarks/stub_n8n_server.py --port 5678 --latency 0.02 --error-rate 0.01
+    python n8n_guardian.py loadtest http://localhost:5678/webhook/loadtest --rate 200 --duration 30
+    npm_config_registry=http://localhost:5678 python n8n_guardian.py
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubN8NHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, como n8n
+    disable_nagle_algorithm = True
+    server_version = "n8n-stub/1.0"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def send_json(self, status, payload, extra_headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (extra_headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def send_dist_tags(self):
+        tags = {"latest": self.server.latest_version}
+        etag = '"' + hashlib.sha1(json.dumps(tags).encode("utf-8")).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.server.count_registry(revalidated=True)
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.server.count_registry(revalidated=False)
+        self.send_json(200, tags, {"ETag": etag})
+
+    def handle_request(self):
+        length = int(self.headers.get("Content-Length", 0) or 0)
+        if length:
+            self.rfile.read(length)
+        self.server.count_request()
+
+        path = self.path.split("?", 1)[0]
+        if path == "/healthz":
+            self.send_json(200, {"status": "ok"})
+            return
+        if path.startswith("/-/package/") and path.endswith("/dist-tags"):
+            self.send_dist_tags()
+            return
+        if path.startswith("/webhook/") or path.startswith("/webhook-test/"):
+            if self.server.latency:
+                time.sleep(self.server.latency)
+            if self.server.error_rate and random.random() < self.server.error_rate:
+                self.send_json(500, {"message": "Error simulado del stub"})
+                return
+            self.send_json(200, {"message": "Workflow was started"})
+            return
+        self.send_json(404, {"message": "Not found"})
+
+    do_GET = handle_request
+    do_POST = handle_request
+    do_HEAD = handle_request
+
+
+class StubN8NServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, error_rate=0.0, verbose=False, latest_version=None):
+        super().__init__((host, port), StubN8NHandler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.verbose = verbose
+        self.latest_version = latest_version or os.environ.get("GUARDIAN_STUB_N8N_VERSION", "1.93.0")
+        self.requests = 0
+        self.registry_fetches = 0
+        self.registry_revalidations = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def count_registry(self, revalidated):
+        with self._lock:
+            if revalidated:
+                self.registry_revalidations += 1
+            else:
+                self.registry_fetches += 1
+
+    def start(self):
+        """Servir en un hilo en segundo plano (útil desde benchmarks)"""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor falso de n8n para pruebas del guardian")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5678)
+    parser.add_argument("--latency", type=float, default=0.0, help="Latencia por petición de webhook (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fracción de respuestas 500")
+    parser.add_argument("--latest-version", help="Versión 'latest' que anuncia el registro falso")
+    parser.add_argument("--verbose", action="store_true", help="Registrar cada petición")
+    args = parser.parse_args(argv)
+
+    server = StubN8NServer(args.host, args.port, args.latency, args.error_rate, args.verbose, args.latest_version)
+    print(f"🧪 Stub de n8n escuchando en {server.url}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
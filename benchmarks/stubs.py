@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""
+Ejecutables falsos de node, npm, npx y n8n para benchmarks offline.
+
+Los stubs se generan como scripts Python en un directorio temporal que se
+antepone al PATH. Su comportamiento se controla con variables de entorno:
+
+    GUARDIAN_STUB_LATENCY       Segundos de espera antes de responder (float)
+    GUARDIAN_STUB_OUTPUT_BYTES  Bytes de relleno en salidas "largas" (npm list, n8n)
+    GUARDIAN_STUB_AUDIT_FILE    Archivo cuyo contenido devuelve `npm audit`
+    GUARDIAN_STUB_N8N_VERSION   Versión que reportan n8n y npm (por defecto 1.93.0)
+
+`npm pack` y `npm install --global --prefix` generan tarballs e instalaciones
+mínimas para probar la caché de paquetes del guardian sin red.
+"""
+
+import json
+import os
+import stat
+import sys
+from pathlib import Path
+
+STUB_TEMPLATE = r'''#!{python}
+# -*- coding: utf-8 -*-
+# Stub generado por benchmarks/stubs.py - no editar
+import base64
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tarfile
+import time
+
+NAME = {name!r}
+VERSION = os.environ.get("GUARDIAN_STUB_N8N_VERSION", "1.93.0")
+
+
+def padding():
+    size = int(os.environ.get("GUARDIAN_STUB_OUTPUT_BYTES", "0") or 0)
+    line = "├── stub-dependency@1.0.0\n"
+    return line * (size // len(line))
+
+
+def run_n8n(args):
+    if args and args[0] in ("--version", "-v"):
+        print(VERSION)
+        return 0
+    # Proceso de larga duración: imprimir algo y esperar a ser terminado
+    sys.stdout.write(padding())
+    print("n8n ready on 0.0.0.0, port 5678")
+    sys.stdout.flush()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        return 0
+
+
+def option(args, name):
+    return args[args.index(name) + 1] if name in args else None
+
+
+def npm_pack(args):
+    """npm pack n8n@<versión> --json --pack-destination <dir>"""
+    spec = next(arg for arg in args[1:] if not arg.startswith("-") and arg != option(args, "--pack-destination")
+                and arg != option(args, "--cache"))
+    version = spec.split("@", 1)[1] if "@" in spec else "latest"
+    version = VERSION if version == "latest" else version
+    destination = option(args, "--pack-destination") or "."
+    filename = "n8n-" + version + ".tgz"
+    path = os.path.join(destination, filename)
+    package_json = os.path.join(destination, "package.json")
+    with open(package_json, "w", encoding="utf-8") as f:
+        json.dump(dict(name="n8n", version=version), f)
+    with tarfile.open(path, "w:gz") as tar:
+        tar.add(package_json, arcname="package/package.json")
+    os.unlink(package_json)
+    with open(path, "rb") as f:
+        integrity = "sha512-" + base64.b64encode(hashlib.sha512(f.read()).digest()).decode("ascii")
+    print(json.dumps([dict(name="n8n", version=version, filename=filename, integrity=integrity)]))
+    return 0
+
+
+def npm_install_prefix(args):
+    """npm install --global --prefix <dir> <tarball>: copia este stub como bin/n8n"""
+    prefix = option(args, "--prefix")
+    tarball = next(arg for arg in args[1:] if arg.endswith(".tgz"))
+    module_dir = os.path.join(prefix, "lib", "node_modules", "n8n")
+    os.makedirs(module_dir, exist_ok=True)
+    with tarfile.open(tarball) as tar:
+        package = json.load(tar.extractfile("package/package.json"))
+    with open(os.path.join(module_dir, "package.json"), "w", encoding="utf-8") as f:
+        json.dump(package, f)
+    os.makedirs(os.path.join(prefix, "bin"), exist_ok=True)
+    n8n_bin = os.path.join(prefix, "bin", "n8n")
+    shutil.copy(os.path.join(os.path.dirname(os.path.abspath(__file__)), "n8n"), n8n_bin)
+    print("added 1 package in 0.1s")
+    return 0
+
+
+def run_npm(args):
+    if not args:
+        return 1
+    if args[0] == "--version":
+        print("10.2.4")
+    elif args[0] in ("list", "ls"):
+        print("/usr/local/lib")
+        sys.stdout.write(padding())
+        print("└── n8n@" + VERSION)
+    elif args[0] == "view":
+        print(VERSION)
+    elif args[0] == "audit":
+        audit_file = os.environ.get("GUARDIAN_STUB_AUDIT_FILE")
+        if audit_file and os.path.exists(audit_file):
+            with open(audit_file, "r", encoding="utf-8") as f:
+                sys.stdout.write(f.read())
+            return 1
+        if "--json" in args:
+            counts = dict(info=0, low=0, moderate=0, high=0, critical=0, total=0)
+            print(json.dumps(dict(auditReportVersion=2, vulnerabilities=dict(),
+                                  metadata=dict(vulnerabilities=counts))))
+        else:
+            print("found 0 vulnerabilities")
+    elif args[0] == "pack":
+        return npm_pack(args)
+    elif args[0] in ("install", "i") and "--prefix" in args:
+        return npm_install_prefix(args)
+    elif args[0] in ("install", "uninstall", "update", "i"):
+        print("changed 1 package in 0.1s")
+    else:
+        print("npm stub: comando no soportado: " + " ".join(args), file=sys.stderr)
+        return 1
+    return 0
+
+
+def main():
+    time.sleep(float(os.environ.get("GUARDIAN_STUB_LATENCY", "0") or 0))
+    args = sys.argv[1:]
+    if NAME == "node":
+        if args and args[0] == "--version":
+            print("v20.11.0")
+            return 0
+        return 0
+    if NAME == "npx":
+        if args and args[0] == "n8n":
+            return run_n8n(args[1:])
+        return 1
+    if NAME == "npm":
+        return run_npm(args)
+    return run_n8n(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+'''
+
+STUB_NAMES = ("node", "npm", "npx", "n8n")
+
+
+def create_stub_bin(directory):
+    """Crear los ejecutables falsos en `directory` y devolver su ruta"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    for name in STUB_NAMES:
+        stub = directory / name
+        stub.write_text(STUB_TEMPLATE.format(python=sys.executable, name=name), encoding="utf-8")
+        stub.chmod(stub.stat().st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return directory
+
+
+def stub_environment(bin_dir, latency=0.0, output_bytes=0, audit_file=None):
+    """Variables de entorno para que el guardian use los stubs"""
+    env = {
+        "PATH": f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}",
+        "GUARDIAN_STUB_LATENCY": str(latency),
+        "GUARDIAN_STUB_OUTPUT_BYTES": str(int(output_bytes)),
+    }
+    if audit_file:
+        env["GUARDIAN_STUB_AUDIT_FILE"] = str(audit_file)
+    return env
+
+
+def synthetic_audit_report(size_bytes):
+    """Generar un reporte de `npm audit` sintético de aproximadamente `size_bytes`"""
+    severities = ("critical", "high", "moderate", "low")
+    blocks = []
+    total = 0
+    i = 0
+    while total < size_bytes:
+        severity = severities[i % len(severities)]
+        block = (
+            f"stub-package-{i}  <={i % 10}.{i % 7}.0\n"
+            f"Severity: {severity}\n"
+            f"Prototype Pollution in stub-package-{i} - https://github.com/advisories/GHSA-{i:04x}-stub\n"
+            f"fix available via `npm audit fix`\n"
+            f"node_modules/stub-package-{i}\n\n"
+        )
+        blocks.append(block)
+        total += len(block)
+        i += 1
+    blocks.append(f"{i} vulnerabilities ({i // 4} low, {i // 4} moderate, {i // 4} high, {i // 4} critical)\n")
+    return "".join(blocks)
+
+
+def synthetic_audit_json(per_severity):
+    """Reporte de `npm audit --json` (formato npm 7+) con `per_severity` avisos de cada severidad"""
+    counts = {severity: per_severity for severity in ("info", "low", "moderate", "high", "critical")}
+    counts["info"] = 0
+    counts["total"] = sum(counts.values())
+    vulnerabilities = {}
+    for i, severity in enumerate(s for s in ("critical", "high", "moderate", "low") for _ in range(per_severity)):
+        vulnerabilities[f"stub-package-{i}"] = {"name": f"stub-package-{i}", "severity": severity,
+                                                "range": f"<={i % 10}.{i % 7}.0", "fixAvailable": True}
+    return json.dumps({"auditReportVersion": 2, "vulnerabilities": vulnerabilities,
+                       "metadata": {"vulnerabilities": counts}}, indent=2)
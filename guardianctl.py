@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Punto de entrada ligero de N8N Guardian para comandos de una sola ejecución
+
+Importa n8n_guardian como módulo, así Python reutiliza su bytecode de
+__pycache__ en lugar de recompilar el script completo en cada llamada.
+
+Uso:
+    python guardianctl.py ctl status
+    python guardianctl.py db
+"""
+
+import sys
+
+from n8n_guardian import main
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,26 +8,65 @@ Autor: Claude AI Assistant
 
 import os
 import sys
-import subprocess
 import time
-import threading
-import logging
 import json
-import webbrowser
-from datetime import datetime
+import re
+import argparse
+import functools
+import importlib.util
+from collections import deque
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
-import urllib.request
-import urllib.error
 
-# Instalar colorama si no está disponible
+def lazy_import(name):
+    """Registrar un módulo que solo se carga al acceder a su primer atributo
+
+    Los comandos de una sola ejecución (ctl, db, backup...) no pagan el coste de
+    importar asyncio, urllib o logging si no los usan. Medir con:
+        python -X importtime guardianctl.py ctl status
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    parent, _, child = name.rpartition('.')
+    if parent:
+        setattr(sys.modules[parent], child, module)
+    return module
+
+asyncio = lazy_import("asyncio")
+subprocess = lazy_import("subprocess")
+threading = lazy_import("threading")
+logging = lazy_import("logging")
+hashlib = lazy_import("hashlib")
+webbrowser = lazy_import("webbrowser")
+ssl = lazy_import("ssl")
+signal = lazy_import("signal")
+socket = lazy_import("socket")
+queue = lazy_import("queue")
+sqlite3 = lazy_import("sqlite3")
+shlex = lazy_import("shlex")
+lazy_import("concurrent.futures")
+lazy_import("urllib.parse")
+lazy_import("urllib.request")
+lazy_import("urllib.error")
+# Paquetes padre, ya cargados por find_spec
+import concurrent
+import urllib
+
+# colorama es opcional: sin ella la salida simplemente va sin colores
 try:
-    from colorama import Fore, Back, Style, init
+    from colorama import Fore, Style, init
     init(autoreset=True)
 except ImportError:
-    print("📦 Instalando colorama para colores...")
-    subprocess.run([sys.executable, "-m", "pip", "install", "colorama"], check=True)
-    from colorama import Fore, Back, Style, init
-    init(autoreset=True)
+    class _NoColor:
+        def __getattr__(self, name):
+            return ""
+    Fore = Style = _NoColor()
 
 # Configuración de colores
 class Colors:
@@ -39,23 +78,1808 @@ class Colors:
     NORMAL = Style.RESET_ALL
     BOLD = Style.BRIGHT
 
-class N8NGuardian:
+class _NullSpan:
+    """Span vacío que devuelve Tracer.span() cuando el trazado está desactivado"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class _Span:
+    def __init__(self, tracer, name, track, args):
+        self.tracer = tracer
+        self.name = name
+        self.track = track
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.tracer.record(self.name, self.start, time.perf_counter(), self.track, self.args)
+        return False
+
+class Tracer:
+    """Spans en formato Chrome trace-event (abrir en https://ui.perfetto.dev o chrome://tracing)
+
+    Desactivado, span() solo comprueba un booleano y devuelve un span vacío compartido.
+    Las corrutinas se intercalan en el mismo hilo, así que sus spans van a pistas
+    (`track`) propias para que no se solapen en el visor.
+    """
+
     def __init__(self):
+        self.enabled = False
+        self.events = []
+        self._origin = time.perf_counter()
+        self._tracks = {}
+
+    def enable(self):
+        self.enabled = True
+        self._origin = time.perf_counter()
+        self.events = [{"name": "process_name", "ph": "M", "pid": os.getpid(), "args": {"name": "n8n-guardian"}}]
+
+    def span(self, name, track=None, **args):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, track, args)
+
+    def _track_id(self, track):
+        if track is None:
+            return threading.get_ident()
+        if track not in self._tracks:
+            self._tracks[track] = len(self._tracks) + 1
+            self.events.append({"name": "thread_name", "ph": "M", "pid": os.getpid(),
+                                "tid": self._tracks[track], "args": {"name": track}})
+        return self._tracks[track]
+
+    def record(self, name, start, end, track=None, args=None):
+        self.events.append({
+            "name": name, "cat": "guardian", "ph": "X", "pid": os.getpid(), "tid": self._track_id(track),
+            "ts": round((start - self._origin) * 1e6, 1), "dur": round((end - start) * 1e6, 1),
+            "args": args or {},
+        })
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, f)
+        return len(self.events)
+
+TRACER = Tracer()
+
+def traced(name=None, track=None):
+    """Decorador: envolver una función o corrutina en un span de TRACER"""
+    def decorator(function):
+        span_name = name or function.__name__
+        # CO_COROUTINE: evita importar asyncio/inspect al decorar (ver lazy_import)
+        if function.__code__.co_flags & 0x80:
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                with TRACER.span(span_name, track):
+                    return await function(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not TRACER.enabled:
+                return function(*args, **kwargs)
+            with TRACER.span(span_name, track):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def read_process_tree_usage(root_pid):
+    """Leer CPU acumulada (s), RSS (bytes) y número de procesos del árbol de root_pid desde /proc"""
+    proc = Path("/proc")
+    if not (proc / str(root_pid)).exists():
+        return None
+
+    def children_of(pid):
+        # /proc/<pid>/task/<tid>/children evita recorrer todo /proc (Linux 3.5+)
+        found = []
+        try:
+            for task in (proc / str(pid) / "task").iterdir():
+                found.extend(int(child) for child in (task / "children").read_text().split())
+            return found
+        except OSError:
+            pass
+        # Alternativa: construir una sola vez el mapa padre -> hijos (n8n suele ejecutarse bajo un shell)
+        if children_map is None:
+            build_children_map()
+        return children_map.get(pid, [])
+
+    children_map = None
+
+    def build_children_map():
+        nonlocal children_map
+        children_map = {}
+        for entry in proc.iterdir():
+            if not entry.name.isdigit():
+                continue
+            try:
+                stat = (entry / "stat").read_text()
+                ppid = int(stat[stat.rfind(')') + 2:].split()[1])
+                children_map.setdefault(ppid, []).append(int(entry.name))
+            except (OSError, ValueError, IndexError):
+                continue
+
+    ticks = os.sysconf("SC_CLK_TCK")
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    cpu_seconds = 0.0
+    rss_bytes = 0
+    count = 0
+    pending = [root_pid]
+    while pending:
+        pid = pending.pop()
+        try:
+            stat = (proc / str(pid) / "stat").read_text()
+            fields = stat[stat.rfind(')') + 2:].split()
+            # utime y stime son los campos 14 y 15 (índices 11 y 12 tras el nombre)
+            cpu_seconds += (int(fields[11]) + int(fields[12])) / ticks
+            rss_bytes += int(fields[21]) * page_size
+            count += 1
+        except (OSError, ValueError, IndexError):
+            continue
+        pending.extend(children_of(pid))
+    return cpu_seconds, rss_bytes, count
+
+def percentile(sorted_values, pct):
+    """Percentil por interpolación lineal de una lista ya ordenada"""
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * pct / 100.0
+    lower = int(k)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (k - lower)
+
+class HTTPProtocolError(Exception):
+    """Respuesta HTTP cuyo final no se puede determinar"""
+
+async def read_http_response(reader, close_delimited=False):
+    """Leer una respuesta HTTP/1.1 completa; devuelve (status, headers, body, keep_alive)
+
+    Un cuerpo sin Content-Length ni chunked solo se lee hasta EOF si la conexión se
+    cierra al terminar (`close_delimited`, o `Connection: close` del servidor); en una
+    conexión keep-alive esa lectura esperaría hasta el timeout, así que es un error.
+    """
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("conexión cerrada por el servidor")
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    closing = headers.get("connection", "").lower() == "close"
+    if 100 <= status < 200 or status in (204, 304):
+        body = b""  # Respuestas sin cuerpo por definición
+    elif headers.get("transfer-encoding", "").lower() == "chunked":
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            chunks.append((await reader.readexactly(size + 2))[:size])
+            if size == 0:
+                break
+        body = b"".join(chunks)
+    elif "content-length" in headers:
+        body = await reader.readexactly(int(headers["content-length"]))
+    elif close_delimited or closing:
+        return status, headers, await reader.read(), False
+    else:
+        raise HTTPProtocolError("respuesta keep-alive sin Content-Length ni Transfer-Encoding: chunked")
+    return status, headers, body, not closing
+
+async def http_request(url, method="GET", headers=None, body=b"", timeout=5.0):
+    """Petición HTTP/1.1 simple sobre asyncio (sin dependencias); devuelve (status, headers, body, latencia_s)"""
+    parts = urllib.parse.urlsplit(url)
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    ssl_context = ssl.create_default_context() if parts.scheme == "https" else None
+    path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+
+    start = time.perf_counter()
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(parts.hostname, port, ssl=ssl_context), timeout)
+    try:
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {parts.netloc}", "User-Agent: n8n-guardian",
+                 "Connection: close", f"Content-Length: {len(body)}"]
+        lines.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+        status, response_headers, response_body, _ = await asyncio.wait_for(read_http_response(reader, close_delimited=True), timeout)
+    finally:
+        writer.close()
+    return status, response_headers, response_body, time.perf_counter() - start
+
+class WebhookLoadTester:
+    """Generador de carga de lazo abierto contra un webhook de n8n"""
+
+    def __init__(self, url, rate=10.0, duration=10.0, connections=10, method="POST",
+                 payload=None, timeout=10.0, sample_pid=None, sample_interval=0.5):
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            raise ValueError(f"URL no soportada: {url}")
+        self.url = url
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        self.host_header = parts.netloc
+        self.rate = float(rate)
+        self.duration = float(duration)
+        self.connections = max(1, int(connections))
+        self.method = method.upper()
+        self.body = json.dumps(payload if payload is not None else {"source": "n8n-guardian-loadtest"}).encode("utf-8")
+        self.timeout = timeout
+        self.sample_pid = sample_pid
+        self.sample_interval = sample_interval
+
+        self.latencies = []
+        self.completions = []  # (segundo relativo, latencia o None si error)
+        self.errors = {}
+        self.samples = []
+
+    async def _open_connection(self):
+        ssl_context = ssl.create_default_context() if self.scheme == "https" else None
+        return await asyncio.open_connection(self.host, self.port, ssl=ssl_context)
+
+    async def _exchange(self, connection):
+        reader, writer = connection
+        request = (
+            f"{self.method} {self.path} HTTP/1.1\r\n"
+            f"Host: {self.host_header}\r\n"
+            f"User-Agent: n8n-guardian-loadtest\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(self.body)}\r\n"
+            f"Connection: keep-alive\r\n\r\n"
+        ).encode("latin-1") + self.body
+        writer.write(request)
+        await writer.drain()
+        status, _, _, keep_alive = await asyncio.wait_for(read_http_response(reader), self.timeout)
+        return status, keep_alive
+
+    async def _request(self, pool, scheduled_at, start_time):
+        loop = asyncio.get_event_loop()
+        connection = None
+        error = None
+        try:
+            async with self._slots:
+                if pool:
+                    # Una conexión keep-alive puede haber sido cerrada por el servidor: reintentar una vez
+                    connection = pool.pop()
+                    try:
+                        status, keep_alive = await self._exchange(connection)
+                    except (ConnectionError, asyncio.IncompleteReadError):
+                        connection[1].close()
+                        connection = None
+                if connection is None:
+                    connection = await asyncio.wait_for(self._open_connection(), self.timeout)
+                    status, keep_alive = await self._exchange(connection)
+                if keep_alive:
+                    pool.append(connection)
+                else:
+                    connection[1].close()
+                connection = None
+                if status >= 400:
+                    error = f"HTTP {status}"
+        except asyncio.TimeoutError:
+            error = "timeout"
+        except Exception as e:
+            error = type(e).__name__
+        finally:
+            if connection:
+                connection[1].close()
+
+        # La latencia se mide desde el instante programado (evita coordinated omission)
+        finished_at = loop.time()
+        latency = finished_at - scheduled_at
+        second = int(finished_at - start_time)
+        if error:
+            self.errors[error] = self.errors.get(error, 0) + 1
+            self.completions.append((second, None))
+        else:
+            self.latencies.append(latency)
+            self.completions.append((second, latency))
+
+    async def _sample(self, start_time, stop_event):
+        loop = asyncio.get_event_loop()
+        previous = None
+        while not stop_event.is_set():
+            usage = read_process_tree_usage(self.sample_pid)
+            now = loop.time()
+            if usage:
+                cpu_seconds, rss_bytes, procs = usage
+                if previous:
+                    cpu_percent = 100.0 * (cpu_seconds - previous[1]) / max(now - previous[0], 1e-9)
+                    self.samples.append({
+                        "t": round(now - start_time, 3),
+                        "cpu_percent": round(cpu_percent, 1),
+                        "rss_mb": round(rss_bytes / 1024 / 1024, 1),
+                        "processes": procs,
+                    })
+                previous = (now, cpu_seconds)
+            try:
+                await asyncio.wait_for(stop_event.wait(), self.sample_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run(self):
+        """Ejecutar la prueba de carga y devolver el reporte"""
+        loop = asyncio.get_event_loop()
+        self._slots = asyncio.Semaphore(self.connections)
+        pool = []
+        stop_sampling = asyncio.Event()
+        total = int(self.rate * self.duration)
+
+        start_time = loop.time()
+        sampler = None
+        if self.sample_pid:
+            sampler = asyncio.ensure_future(self._sample(start_time, stop_sampling))
+
+        # Lazo abierto: las llegadas siguen un calendario fijo sin esperar respuestas
+        tasks = []
+        for i in range(total):
+            scheduled_at = start_time + i / self.rate
+            delay = scheduled_at - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.ensure_future(self._request(pool, scheduled_at, start_time)))
+        if tasks:
+            await asyncio.wait(tasks)
+        elapsed = loop.time() - start_time
+
+        stop_sampling.set()
+        if sampler:
+            await sampler
+        for _, writer in pool:
+            writer.close()
+        return self.build_report(total, elapsed)
+
+    def build_report(self, total, elapsed):
+        latencies = sorted(self.latencies)
+        error_count = sum(self.errors.values())
+
+        # Serie temporal por segundo para relacionar carga con CPU/RSS de n8n
+        timeline = {}
+        for second, latency in self.completions:
+            bucket = timeline.setdefault(second, {"t": second, "requests": 0, "errors": 0, "latencies": []})
+            bucket["requests"] += 1
+            if latency is None:
+                bucket["errors"] += 1
+            else:
+                bucket["latencies"].append(latency)
+        for sample in self.samples:
+            bucket = timeline.setdefault(int(sample["t"]), {"t": int(sample["t"]), "requests": 0, "errors": 0, "latencies": []})
+            bucket.setdefault("cpu_percent", []).append(sample["cpu_percent"])
+            bucket.setdefault("rss_mb", []).append(sample["rss_mb"])
+        series = []
+        for second in sorted(timeline):
+            bucket = timeline[second]
+            bucket_latencies = sorted(bucket.pop("latencies"))
+            p50 = percentile(bucket_latencies, 50)
+            bucket["p50_ms"] = round(p50 * 1000, 2) if p50 is not None else None
+            if "cpu_percent" in bucket:
+                bucket["cpu_percent"] = round(max(bucket["cpu_percent"]), 1)
+                bucket["rss_mb"] = round(max(bucket["rss_mb"]), 1)
+            series.append(bucket)
+
+        def ms(pct):
+            value = percentile(latencies, pct)
+            return round(value * 1000, 2) if value is not None else None
+
+        report = {
+            "url": self.url,
+            "method": self.method,
+            "target_rate": self.rate,
+            "duration_s": self.duration,
+            "connections": self.connections,
+            "requests": total,
+            "successful": len(latencies),
+            "errors": error_count,
+            "error_rate": round(error_count / total, 4) if total else 0.0,
+            "error_kinds": dict(self.errors),
+            "elapsed_s": round(elapsed, 3),
+            "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed > 0 else 0.0,
+            "latency_ms": {
+                "min": ms(0), "p50": ms(50), "p90": ms(90),
+                "p99": ms(99), "p999": ms(99.9), "max": ms(100),
+            },
+            "timeline": series,
+        }
+        if self.samples:
+            cpu = [s["cpu_percent"] for s in self.samples]
+            rss = [s["rss_mb"] for s in self.samples]
+            report["n8n_resources"] = {
+                "pid": self.sample_pid,
+                "samples": len(self.samples),
+                "cpu_percent_avg": round(sum(cpu) / len(cpu), 1),
+                "cpu_percent_max": max(cpu),
+                "rss_mb_avg": round(sum(rss) / len(rss), 1),
+                "rss_mb_max": max(rss),
+            }
+        return report
+
+async def run_shell(command, timeout=60.0, input=None):
+    """Ejecutar un comando de shell con asyncio; devuelve (código, stdout, stderr)"""
+    process = await asyncio.create_subprocess_shell(
+        command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+        stdin=asyncio.subprocess.PIPE if input is not None else None
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(input), timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        raise
+    return (process.returncode,
+            stdout.decode('utf-8', errors='replace'),
+            stderr.decode('utf-8', errors='replace'))
+
+def parse_audit_counts(audit_output):
+    """Contar vulnerabilidades por severidad a partir de `npm audit --json`
+
+    Lanza ValueError si la salida no es el reporte esperado (no es JSON, npm devolvió
+    un objeto `error` o falta `metadata.vulnerabilities`): sin esto un audit fallido
+    contaría como una instancia sin vulnerabilidades.
+    """
+    try:
+        report = json.loads(audit_output)
+    except ValueError:
+        raise ValueError(f"salida no JSON: {audit_output.strip()[:200] or 'vacía'}")
+    if not isinstance(report, dict):
+        raise ValueError("reporte JSON inesperado")
+    error = report.get("error")
+    if error:
+        if isinstance(error, dict):
+            error = error.get("summary") or error.get("code") or json.dumps(error)
+        raise ValueError(str(error).strip().splitlines()[0][:200])
+    vulnerabilities = (report.get("metadata") or {}).get("vulnerabilities")
+    if not isinstance(vulnerabilities, dict):
+        raise ValueError("el reporte no tiene metadata.vulnerabilities")
+    return {severity: int(vulnerabilities.get(severity, 0)) for severity in ("critical", "high", "moderate", "low")}
+
+class FleetChecker:
+    """Chequeos concurrentes (con paralelismo acotado) sobre un inventario de instancias n8n"""
+
+    CHECKS = ("health", "preflight", "version", "audit")
+
+    def __init__(self, instances, checks=None, parallel=8, timeout=60.0, health_path="/healthz",
+                 latest_version=None, compare_versions=None):
+        self.instances = instances
+        self.checks = list(checks or self.CHECKS)
+        self.parallel = max(1, int(parallel))
+        self.timeout = timeout
+        self.health_path = health_path
+        self.latest_version = latest_version
+        self.compare_versions = compare_versions
+
+    def _command(self, instance, command):
+        """Componer el comando para la instancia (prefijo remoto, ej. 'ssh host', y directorio)"""
+        if instance.get("workdir"):
+            command = f"cd {shlex.quote(instance['workdir'])} && {command}"
+        prefix = instance.get("command_prefix")
+        if prefix:
+            # El comando remoto viaja como un único argumento para el prefijo
+            command = f"{prefix} {shlex.quote(command)}" if prefix.split()[0] == "ssh" else f"{prefix} {command}"
+        return command
+
+    async def _version_of(self, instance, executable):
+        returncode, stdout, stderr = await run_shell(self._command(instance, f"{executable} --version"), self.timeout)
+        if returncode != 0:
+            raise RuntimeError((stderr or stdout).strip()[:200] or f"código {returncode}")
+        return stdout.strip().splitlines()[-1].lstrip('v') if stdout.strip() else None
+
+    async def _check_health(self, instance, result):
+        url = instance["url"].rstrip('/') + instance.get("health_path", self.health_path)
+        try:
+            status, _, _, latency = await http_request(url, timeout=min(self.timeout, 10))
+            result["health"] = {"healthy": status < 500, "status": status, "latency_ms": round(latency * 1000, 1)}
+        except Exception as e:
+            result["health"] = {"healthy": False, "status": None, "latency_ms": None}
+            result["errors"].append(f"health: {type(e).__name__}")
+
+    async def _check_preflight(self, instance, result):
+        preflight = {}
+        for tool, executable in (("node", "node"), ("npm", instance.get("npm", "npm"))):
+            try:
+                preflight[tool] = await self._version_of(instance, executable)
+            except Exception as e:
+                preflight[tool] = None
+                result["errors"].append(f"{tool}: {str(e) or type(e).__name__}")
+        result["preflight"] = preflight
+
+    async def _check_version(self, instance, result):
+        try:
+            installed = await self._version_of(instance, instance.get("n8n", "n8n"))
+        except Exception as e:
+            installed = None
+            result["errors"].append(f"n8n: {str(e) or type(e).__name__}")
+        result["version"] = {"installed": installed, "latest": self.latest_version, "outdated": None}
+        if installed and self.latest_version and self.compare_versions:
+            result["version"]["outdated"] = self.compare_versions(installed, self.latest_version)
+
+    async def _check_audit(self, instance, result):
+        npm = instance.get("npm", "npm")
+        try:
+            # npm audit sale con código 1 cuando hay vulnerabilidades: el que manda es el JSON
+            returncode, stdout, stderr = await run_shell(self._command(instance, f"{npm} audit --json"), self.timeout)
+            if returncode != 0 and not stdout.strip():
+                raise RuntimeError(stderr.strip()[:200] or f"código {returncode}")
+            result["audit"] = parse_audit_counts(stdout)
+        except Exception as e:
+            result["audit"] = None
+            result["errors"].append(f"audit: {str(e) or type(e).__name__}")
+
+    async def _probe(self, instance, result, probes):
+        async with probes:
+            await self._check_health(instance, result)
+
+    async def _check_instance(self, instance, slots, probes):
+        result = {"name": instance.get("name", instance["url"]), "url": instance["url"], "errors": []}
+        start = time.perf_counter()
+        # La sonda HTTP tiene su propio límite y no espera a los comandos (quizá por ssh)
+        health = asyncio.ensure_future(self._probe(instance, result, probes)) if "health" in self.checks else None
+        async with slots:
+            for check in ("preflight", "version", "audit"):
+                if check in self.checks:
+                    await getattr(self, f"_check_{check}")(instance, result)
+        if health:
+            await health
+        result["duration_s"] = round(time.perf_counter() - start, 3)
+        return result
+
+    async def run(self):
+        """Ejecutar los chequeos en todas las instancias y devolver el reporte agregado"""
+        slots = asyncio.Semaphore(self.parallel)
+        probes = asyncio.Semaphore(self.parallel)
+        start = time.perf_counter()
+        results = await asyncio.gather(*(self._check_instance(instance, slots, probes)
+                                         for instance in self.instances))
+        return {
+            "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            "checks": self.checks,
+            "parallel": self.parallel,
+            "duration_s": round(time.perf_counter() - start, 3),
+            "instances": results,
+            "metrics": self.build_metrics(results),
+        }
+
+    def build_metrics(self, results):
+        latencies = sorted(r["health"]["latency_ms"] for r in results
+                           if r.get("health") and r["health"]["latency_ms"] is not None)
+        audits = [r["audit"] for r in results if r.get("audit")]
+        return {
+            "instances": len(results),
+            "healthy": sum(1 for r in results if r.get("health", {}).get("healthy")),
+            "with_errors": sum(1 for r in results if r["errors"]),
+            "outdated": sum(1 for r in results if (r.get("version") or {}).get("outdated")),
+            "vulnerable": sum(1 for a in audits if a["critical"] or a["high"]),
+            "vulnerabilities": {severity: sum(a[severity] for a in audits)
+                                for severity in ("critical", "high", "moderate", "low")},
+            "health_latency_ms": {
+                "p50": percentile(latencies, 50),
+                "max": latencies[-1] if latencies else None,
+            },
+            "check_duration_s_max": max((r["duration_s"] for r in results), default=None),
+        }
+
+def default_n8n_data_dir():
+    """Carpeta de datos de n8n (~/.n8n o $N8N_USER_FOLDER/.n8n)"""
+    base = os.environ.get("N8N_USER_FOLDER")
+    return Path(base) / ".n8n" if base else Path.home() / ".n8n"
+
+class ExecutionDatabase:
+    """Monitor de solo lectura y poda incremental de la base SQLite de ejecuciones de n8n"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def _connect_ro(self):
+        # mode=ro: el monitor nunca escribe ni toma bloqueos de escritura
+        uri = f"file:{urllib.parse.quote(str(self.path.resolve()))}?mode=ro"
+        return sqlite3.connect(uri, uri=True, timeout=1.0)
+
+    @staticmethod
+    def _tables(conn):
+        return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+
+    @staticmethod
+    def _columns(conn, table):
+        return {row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')}
+
+    def _date_column(self, conn):
+        columns = self._columns(conn, "execution_entity")
+        for column in ("stoppedAt", "startedAt", "createdAt"):
+            if column in columns:
+                return column
+        raise RuntimeError("execution_entity no tiene columna de fecha conocida")
+
+    def stats(self):
+        """Tamaños de archivo/WAL, filas de ejecuciones y fecha de la más antigua"""
+        wal = Path(f"{self.path}-wal")
+        stats = {
+            "timestamp": time.time(),
+            "path": str(self.path),
+            "file_bytes": self.path.stat().st_size,
+            "wal_bytes": wal.stat().st_size if wal.exists() else 0,
+        }
+        conn = self._connect_ro()
+        try:
+            page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+            stats["freelist_bytes"] = conn.execute("PRAGMA freelist_count").fetchone()[0] * page_size
+            stats["journal_mode"] = conn.execute("PRAGMA journal_mode").fetchone()[0]
+            if "execution_entity" in self._tables(conn):
+                date_column = self._date_column(conn)
+                count, oldest = conn.execute(
+                    f'SELECT COUNT(*), MIN("{date_column}") FROM execution_entity'
+                ).fetchone()
+                stats["executions"] = count
+                stats["oldest_execution"] = oldest
+            else:
+                stats["executions"] = None
+                stats["oldest_execution"] = None
+        finally:
+            conn.close()
+        return stats
+
+    @staticmethod
+    def growth(previous, current):
+        """Crecimiento por hora entre dos muestras de stats()"""
+        hours = (current["timestamp"] - previous["timestamp"]) / 3600
+        if hours < 1 / 60:
+            return None  # Muestras demasiado juntas para una tasa significativa
+        growth = {
+            "bytes_per_hour": round((current["file_bytes"] + current["wal_bytes"]
+                                     - previous["file_bytes"] - previous["wal_bytes"]) / hours),
+            "executions_per_hour": None,
+        }
+        if current.get("executions") is not None and previous.get("executions") is not None:
+            growth["executions_per_hour"] = round((current["executions"] - previous["executions"]) / hours, 1)
+        return growth
+
+    def prune(self, older_than_days, batch_size=500, time_budget_s=30.0, pause_s=0.2):
+        """Borrar ejecuciones terminadas antiguas en lotes pequeños dentro de un presupuesto de tiempo
+
+        Cada lote es una transacción corta, con pausas entre lotes para que n8n
+        pueda escribir. Termina al agotar el presupuesto o al no quedar filas.
+        """
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=older_than_days)).strftime('%Y-%m-%d %H:%M:%S')
+        deadline = time.monotonic() + time_budget_s
+        result = {"cutoff": cutoff, "deleted": 0, "batches": 0, "max_batch_ms": 0.0, "complete": False}
+
+        # busy_timeout corto: si n8n tiene el bloqueo, cedemos en lugar de esperar
+        conn = sqlite3.connect(str(self.path), timeout=0.5, isolation_level=None)
+        start = time.monotonic()
+        try:
+            conn.execute("PRAGMA foreign_keys=ON")
+            if "execution_entity" not in self._tables(conn):
+                raise RuntimeError("la base no contiene la tabla execution_entity")
+            date_column = self._date_column(conn)
+            # Tablas hijas (execution_data, execution_metadata...) sin depender de ON DELETE CASCADE
+            child_tables = [table for table in self._tables(conn)
+                            if table != "execution_entity" and "executionId" in self._columns(conn, table)]
+            finished = ' AND "stoppedAt" IS NOT NULL' if date_column != "stoppedAt" and \
+                "stoppedAt" in self._columns(conn, "execution_entity") else ""
+
+            while time.monotonic() < deadline:
+                batch_start = time.monotonic()
+                try:
+                    conn.execute("BEGIN IMMEDIATE")
+                except sqlite3.OperationalError:
+                    time.sleep(pause_s)  # Base ocupada: reintentar en el siguiente turno
+                    continue
+                try:
+                    ids = [row[0] for row in conn.execute(
+                        f'SELECT id FROM execution_entity WHERE "{date_column}" < ?{finished} ORDER BY id LIMIT ?',
+                        (cutoff, batch_size))]
+                    if not ids:
+                        conn.execute("COMMIT")
+                        result["complete"] = True
+                        break
+                    placeholders = ",".join("?" * len(ids))
+                    for table in child_tables:
+                        conn.execute(f'DELETE FROM "{table}" WHERE "executionId" IN ({placeholders})', ids)
+                    conn.execute(f"DELETE FROM execution_entity WHERE id IN ({placeholders})", ids)
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+                result["deleted"] += len(ids)
+                result["batches"] += 1
+                result["max_batch_ms"] = max(result["max_batch_ms"], round((time.monotonic() - batch_start) * 1000, 2))
+                time.sleep(pause_s)
+
+            # Devolver páginas libres poco a poco si la base usa auto_vacuum incremental
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+                while time.monotonic() < deadline and conn.execute("PRAGMA freelist_count").fetchone()[0] > 0:
+                    try:
+                        # execute() da un solo paso a un pragma sin columnas (una página);
+                        # executescript lo ejecuta hasta el final (hasta 256 páginas)
+                        conn.executescript("PRAGMA incremental_vacuum(256);")
+                    except sqlite3.OperationalError:
+                        pass  # Base ocupada: reintentar tras la pausa
+                    time.sleep(pause_s)
+            if result["deleted"]:
+                conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        finally:
+            conn.close()
+        result["elapsed_s"] = round(time.monotonic() - start, 3)
+        return result
+
+SQLITE_MAGIC = b"SQLite format 3\x00"
+SQLITE_SIDECARS = ("-wal", "-shm", "-journal")
+
+class SnapshotStore:
+    """Snapshots incrementales con almacén de bloques direccionado por contenido
+
+    Estructura bajo `root`:
+        objects/ab/abcdef...   bloques de tamaño fijo, nombrados por su sha256
+        manifests/<id>.json    lista de archivos y bloques de cada snapshot
+    Un archivo con el mismo tamaño y mtime que en el snapshot anterior reutiliza
+    sus bloques sin volver a leerlo.
+    """
+
+    def __init__(self, root, chunk_size=4 * 1024 * 1024):
+        self.root = Path(root)
+        self.chunk_size = chunk_size
+        self.objects_dir = self.root / "objects"
+        self.manifests_dir = self.root / "manifests"
+        self.tmp_dir = self.root / "tmp"
+
+    def _object_path(self, digest):
+        return self.objects_dir / digest[:2] / digest[2:]
+
+    def _store_chunks(self, path, stats):
+        """Trocear `path`, guardar los bloques nuevos y devolver sus hashes"""
+        chunks = []
+        with open(path, "rb") as f:
+            while True:
+                block = f.read(self.chunk_size)
+                if not block:
+                    break
+                digest = hashlib.sha256(block).hexdigest()
+                target = self._object_path(digest)
+                if not target.exists():
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    partial = target.with_name(target.name + ".part")
+                    with open(partial, "wb") as out:
+                        out.write(block)
+                    os.replace(partial, target)
+                    stats["new_chunks"] += 1
+                    stats["new_bytes"] += len(block)
+                chunks.append(digest)
+        stats["hashed_bytes"] += os.path.getsize(path)
+        return chunks
+
+    @staticmethod
+    def _is_sqlite(path):
+        try:
+            with open(path, "rb") as f:
+                return f.read(len(SQLITE_MAGIC)) == SQLITE_MAGIC
+        except OSError:
+            return False
+
+    @staticmethod
+    def _signature(path):
+        st = path.stat()
+        return [st.st_size, st.st_mtime_ns]
+
+    def _sqlite_signature(self, path):
+        # El WAL también cuenta: la base puede cambiar sin tocar el archivo principal
+        signature = self._signature(path)
+        wal = Path(f"{path}-wal")
+        wal_signature = self._signature(wal) if wal.exists() else [0]
+        return signature + (wal_signature if wal_signature[0] else [])
+
+    def _backup_sqlite(self, path, stats):
+        """Copia consistente con la API de backup online de SQLite, sin detener n8n"""
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+        copy = self.tmp_dir / f"{path.name}.{os.getpid()}.backup"
+        source = sqlite3.connect(f"file:{urllib.parse.quote(str(path.resolve()))}?mode=ro", uri=True)
+        try:
+            destination = sqlite3.connect(str(copy))
+            try:
+                source.backup(destination, pages=1024)
+            finally:
+                destination.close()
+            return self._store_chunks(copy, stats), copy.stat().st_size
+        finally:
+            source.close()
+            if copy.exists():
+                copy.unlink()
+
+    def latest(self):
+        snapshots = self.list()
+        return self.load(snapshots[-1]["id"]) if snapshots else None
+
+    def load(self, snapshot_id):
+        with open(self.manifests_dir / f"{snapshot_id}.json", "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def list(self):
+        """Resúmenes de los snapshots, del más antiguo al más reciente"""
+        if not self.manifests_dir.exists():
+            return []
+        summaries = []
+        for manifest_file in sorted(self.manifests_dir.glob("*.json")):
+            manifest = json.loads(manifest_file.read_text(encoding="utf-8"))
+            summaries.append({key: manifest[key] for key in ("id", "created", "reason", "source", "stats")})
+        return summaries
+
+    def create(self, source, reason="manual", exclude=()):
+        """Crear un snapshot de `source`; solo se leen los archivos que cambiaron"""
+        source = Path(source)
+        start = time.monotonic()
+        previous = self.latest()
+        previous_files = {entry["path"]: entry for entry in previous["files"]} if previous and \
+            previous["source"] == str(source) else {}
+        exclude = [Path(path).resolve() for path in exclude]
+        stats = {"files": 0, "bytes": 0, "rehashed_files": 0, "hashed_bytes": 0, "new_chunks": 0, "new_bytes": 0}
+        files = []
+
+        for dirpath, dirnames, filenames in os.walk(source):
+            current = Path(dirpath)
+            dirnames[:] = sorted(name for name in dirnames if (current / name).resolve() not in exclude)
+            sqlite_files = {name for name in filenames if self._is_sqlite(current / name)}
+            for name in sorted(filenames):
+                path = current / name
+                # Los sidecars de SQLite se incorporan a través de la API de backup
+                if any(name == base + suffix for base in sqlite_files for suffix in SQLITE_SIDECARS):
+                    continue
+                if path.is_symlink() or not path.is_file():
+                    continue
+                relative = path.relative_to(source).as_posix()
+                is_sqlite = name in sqlite_files
+                signature = self._sqlite_signature(path) if is_sqlite else self._signature(path)
+                entry = previous_files.get(relative)
+                if entry and entry.get("signature") == signature and \
+                        all(self._object_path(digest).exists() for digest in entry["chunks"]):
+                    entry = dict(entry)
+                else:
+                    if is_sqlite:
+                        chunks, size = self._backup_sqlite(path, stats)
+                    else:
+                        chunks, size = self._store_chunks(path, stats), signature[0]
+                    entry = {"path": relative, "size": size, "signature": signature, "chunks": chunks}
+                    stats["rehashed_files"] += 1
+                entry["mode"] = path.stat().st_mode & 0o777
+                files.append(entry)
+                stats["files"] += 1
+                stats["bytes"] += entry["size"]
+
+        created = datetime.now()
+        snapshot_id = created.strftime('%Y%m%d_%H%M%S_%f')
+        stats["elapsed_s"] = round(time.monotonic() - start, 3)
+        manifest = {
+            "id": snapshot_id,
+            "created": created.strftime('%Y-%m-%d %H:%M:%S'),
+            "reason": reason,
+            "source": str(source),
+            "stats": stats,
+            "files": files,
+        }
+        self.manifests_dir.mkdir(parents=True, exist_ok=True)
+        partial = self.manifests_dir / f"{snapshot_id}.json.part"
+        with open(partial, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(partial, self.manifests_dir / f"{snapshot_id}.json")
+        return manifest
+
+    def restore(self, snapshot_id, target):
+        """Reconstruir un snapshot en `target` verificando el hash de cada bloque"""
+        manifest = self.load(snapshot_id)
+        target = Path(target)
+        if target.exists() and any(target.iterdir()):
+            raise RuntimeError(f"el destino {target} no está vacío")
+        for entry in manifest["files"]:
+            path = target / entry["path"]
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "wb") as out:
+                for digest in entry["chunks"]:
+                    block = self._object_path(digest).read_bytes()
+                    if hashlib.sha256(block).hexdigest() != digest:
+                        raise RuntimeError(f"bloque corrupto {digest} en {entry['path']}")
+                    out.write(block)
+            os.chmod(path, entry.get("mode", 0o600))
+        return manifest
+
+    def prune(self, keep):
+        """Conservar los `keep` snapshots más recientes y borrar los bloques huérfanos"""
+        snapshots = self.list()
+        removed = 0
+        for summary in snapshots[:max(len(snapshots) - keep, 0)]:
+            (self.manifests_dir / f"{summary['id']}.json").unlink()
+            removed += 1
+        if not removed:
+            return 0, 0
+
+        referenced = set()
+        for summary in self.list():
+            for entry in self.load(summary["id"])["files"]:
+                referenced.update(entry["chunks"])
+        freed = 0
+        for chunk in self.objects_dir.glob("*/*"):
+            if chunk.parent.name + chunk.name not in referenced:
+                freed += chunk.stat().st_size
+                chunk.unlink()
+        return removed, freed
+
+DEFAULT_REGISTRY = "https://registry.npmjs.org"
+
+class RegistryClient:
+    """Consulta de dist-tags del registro npm en proceso, con caché TTL y ETag
+
+    Dentro del TTL no hay ninguna petición de red. Al caducar, la petición lleva
+    If-None-Match y un 304 solo renueva la caché existente.
+    """
+
+    def __init__(self, registry_url, cache_file, ttl_s=3600, timeout=10):
+        self.registry_url = registry_url.rstrip('/')
+        self.cache_file = Path(cache_file)
+        self.ttl_s = ttl_s
+        self.timeout = timeout
+
+    def _load_cache(self):
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_cache(self, cache):
+        partial = self.cache_file.with_name(self.cache_file.name + ".part")
+        with open(partial, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, indent=2)
+        os.replace(partial, self.cache_file)
+
+    def dist_tags(self, package):
+        """Devolver (dist-tags, origen) donde origen es 'cache', 'revalidated' o 'fetched'"""
+        url = f"{self.registry_url}/-/package/{urllib.parse.quote(package, safe='@')}/dist-tags"
+        cache = self._load_cache()
+        entry = cache.get(url)
+        if entry and time.time() - entry["fetched_at"] < self.ttl_s:
+            return entry["tags"], "cache"
+
+        request = urllib.request.Request(url, headers={"Accept": "application/json"})
+        if entry and entry.get("etag"):
+            request.add_header("If-None-Match", entry["etag"])
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                tags = json.loads(response.read().decode('utf-8'))
+                etag = response.headers.get("ETag")
+            origin = "fetched"
+        except urllib.error.HTTPError as e:
+            if e.code != 304 or not entry:
+                raise
+            tags, etag = entry["tags"], e.headers.get("ETag") or entry.get("etag")
+            origin = "revalidated"
+
+        cache[url] = {"tags": tags, "etag": etag, "fetched_at": time.time()}
+        self._save_cache(cache)
+        return tags, origin
+
+ALERT_SEVERITIES = ("info", "warning", "critical")
+
+class TokenBucket:
+    """Limitador de ritmo: `rate` fichas por segundo con ráfagas de hasta `burst`"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+class AlertManager:
+    """Alertas agrupadas por ventana, deduplicadas por huella y limitadas por destino
+
+    emit() se puede llamar desde cualquier hilo. Los envíos se hacen en el bucle de
+    supervisión, cada destino en su propia tarea, así que un endpoint lento nunca
+    frena la supervisión. Cada destino tiene su propia cola: lo que no puede enviar
+    (sin fichas o con un lote en vuelo) pasa a la ventana siguiente, y una huella
+    solo cuenta como enviada a ese destino cuando el envío termina bien.
+    """
+
+    def __init__(self, sinks, window_s=30, dedup_s=600, rate_per_minute=6, burst=3,
+                 timeout_s=10, min_severity="warning", executor=None):
+        for sink in sinks:
+            if sink.get("type") not in ("webhook", "command", "file"):
+                raise ValueError(f"tipo de destino de alertas desconocido: {sink.get('type')}")
+        self.sinks = [dict(sink, bucket=TokenBucket(rate_per_minute / 60.0, burst), in_flight=False,
+                           queue={}, last_sent={}, retried=set())
+                      for sink in sinks]
+        self.window_s = window_s
+        self.dedup_s = dedup_s
+        self.timeout_s = timeout_s
+        self.min_level = ALERT_SEVERITIES.index(min_severity)
+        self.executor = executor
+        self._hostname = None  # Se resuelve en el primer envío: crear el gestor no carga socket
+        self.stats = {"emitted": 0, "sent": 0, "deduplicated": 0, "rate_limited": 0, "failed": 0, "dropped": 0}
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._loop = None
+        self._wakeup = None
+        self._sends = set()
+
+    def emit(self, kind, severity, message, fingerprint=None, **details):
+        """Encolar un evento; los repetidos dentro de la ventana se fusionan"""
+        if not self.sinks or ALERT_SEVERITIES.index(severity) < self.min_level:
+            return
+        fingerprint = fingerprint or kind
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        with self._lock:
+            self.stats["emitted"] += 1
+            event = self._pending.get(fingerprint)
+            if event:
+                event.update(message=message, severity=severity, details=details, last_seen=now)
+                event["count"] += 1
+            else:
+                self._pending[fingerprint] = {
+                    "kind": kind, "severity": severity, "message": message, "details": details,
+                    "fingerprint": fingerprint, "count": 1, "first_seen": now, "last_seen": now,
+                }
+        loop = self._loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self._wakeup.set)
+
+    @staticmethod
+    def _merge(queue, event):
+        """Fusionar un evento en la cola de un destino (el más reciente manda)"""
+        queued = queue.get(event["fingerprint"])
+        if queued:
+            queued.update(message=event["message"], severity=event["severity"],
+                          details=event["details"], last_seen=event["last_seen"])
+            queued["count"] += event["count"]
+        else:
+            queue[event["fingerprint"]] = dict(event)
+
+    def _take_batch(self, sink):
+        """Sacar la cola de un destino, descartando huellas que le llegaron hace menos de dedup_s"""
+        now = time.monotonic()
+        events = []
+        for fingerprint, event in sink["queue"].items():
+            sent_at = sink["last_sent"].get(fingerprint)
+            if sent_at is not None and now - sent_at < self.dedup_s:
+                self.stats["deduplicated"] += event["count"]
+                continue
+            events.append(event)
+        sink["queue"] = {}
+        return events
+
+    async def run(self):
+        """Tarea del bucle de supervisión: el primer evento abre una ventana de agrupación"""
+        self._loop = asyncio.get_event_loop()
+        self._wakeup = asyncio.Event()
+        if self._pending:
+            self._wakeup.set()  # Eventos emitidos antes de arrancar el bucle
+        try:
+            while True:
+                await self._wakeup.wait()
+                await asyncio.sleep(self.window_s)
+                self._wakeup.clear()
+                if self.flush():
+                    self._wakeup.set()  # Quedan lotes aplazados: abrir otra ventana
+        finally:
+            self._loop = None
+
+    def flush(self):
+        """Lanzar el envío del lote de cada destino sin esperar a que termine
+
+        Devuelve True si algún destino se quedó con eventos aplazados.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        deferred = False
+        for sink in self.sinks:
+            for event in pending.values():
+                self._merge(sink["queue"], event)
+            if not sink["queue"]:
+                continue
+            if sink["in_flight"] or not sink["bucket"].take():
+                # Sin hueco para este destino: el lote espera a la ventana siguiente
+                self.stats["rate_limited"] += len(sink["queue"])
+                deferred = True
+                continue
+            events = self._take_batch(sink)
+            if not events:
+                continue
+            sink["in_flight"] = True
+            task = asyncio.ensure_future(self._send(sink, events))
+            self._sends.add(task)
+            task.add_done_callback(self._sends.discard)
+        return deferred
+
+    @property
+    def hostname(self):
+        if self._hostname is None:
+            self._hostname = socket.gethostname()
+        return self._hostname
+
+    def _requeue_failed(self, sink, events):
+        """Devolver a la cola del destino los eventos de un envío fallido; cada uno se reintenta una vez"""
+        dropped = 0
+        for event in events:
+            if event["fingerprint"] in sink["retried"]:
+                sink["retried"].discard(event["fingerprint"])
+                dropped += event["count"]
+            else:
+                sink["retried"].add(event["fingerprint"])
+                self._merge(sink["queue"], event)
+        if dropped:
+            self.stats["dropped"] += dropped
+            logging.getLogger(__name__).warning(
+                f"{dropped} alertas descartadas tras fallar también el reintento a {sink['type']}")
+        if sink["queue"] and self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _send(self, sink, events):
+        count = len(events)
+        payload = json.dumps({
+            "source": "n8n-guardian",
+            "host": self.hostname,
+            "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            "events": events,
+        }, ensure_ascii=False).encode('utf-8')
+        try:
+            if sink["type"] == "webhook":
+                headers = dict(sink.get("headers", {}), **{"Content-Type": "application/json"})
+                status, _, _, _ = await http_request(sink["url"], "POST", headers, payload, timeout=self.timeout_s)
+                if status >= 400:
+                    raise RuntimeError(f"HTTP {status}")
+            elif sink["type"] == "command":
+                returncode, _, stderr = await run_shell(sink["command"], self.timeout_s, input=payload + b"\n")
+                if returncode != 0:
+                    raise RuntimeError(f"código {returncode}: {stderr.strip()[:200]}")
+            else:
+                await asyncio.get_event_loop().run_in_executor(self.executor, self._append_file, sink["path"], payload)
+            sent_at = time.monotonic()
+            for event in events:
+                sink["last_sent"][event["fingerprint"]] = sent_at
+                sink["retried"].discard(event["fingerprint"])
+            self.stats["sent"] += count
+        except Exception as e:
+            self.stats["failed"] += count
+            logging.getLogger(__name__).warning(f"No se pudo enviar alerta a {sink['type']}: {e}")
+            self._requeue_failed(sink, events)
+        finally:
+            sink["in_flight"] = False
+
+    @staticmethod
+    def _append_file(path, payload):
+        with open(path, 'ab') as f:
+            f.write(payload + b"\n")
+
+    @property
+    def pending(self):
+        return bool(self._pending) or any(sink["queue"] for sink in self.sinks)
+
+    async def drain(self, timeout=None):
+        """Enviar lo pendiente y esperar a los envíos en curso (al terminar)
+
+        Los eventos devueltos a la cola por un envío fallido tienen aquí su reintento;
+        lo que aún quede sin enviar se registra en el log.
+        """
+        for _ in range(2):
+            self.flush()
+            if self._sends:
+                await asyncio.wait(list(self._sends), timeout=timeout or self.timeout_s)
+            if not self.pending:
+                return
+        unsent = sum(len(sink["queue"]) for sink in self.sinks)
+        logging.getLogger(__name__).warning(f"{unsent} alertas sin enviar al terminar")
+
+IOPRIO_CLASSES = {"realtime": 1, "best-effort": 2, "idle": 3}
+IOPRIO_NAMES = {value: name for name, value in IOPRIO_CLASSES.items()}
+# Números de syscall (ioprio_set, ioprio_get) por arquitectura: Python no los expone
+IOPRIO_SYSCALLS = {"x86_64": (251, 252), "aarch64": (30, 31), "i686": (289, 290), "armv7l": (314, 315)}
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+
+@functools.lru_cache(maxsize=None)
+def _libc_syscall():
+    numbers = IOPRIO_SYSCALLS.get(os.uname().machine) if hasattr(os, "uname") else None
+    if not numbers or not sys.platform.startswith("linux"):
+        return None
+    import ctypes
+    return ctypes.CDLL(None, use_errno=True).syscall, numbers
+
+def ioprio_set(pid, io_class, level=4):
+    """Fijar la clase de E/S de un proceso o hilo (0 = el actual); False si no hay soporte"""
+    libc = _libc_syscall()
+    if libc is None:
+        return False
+    syscall, (set_number, _) = libc
+    return syscall(set_number, 1, pid, (io_class << 13) | level) == 0  # 1 = IOPRIO_WHO_PROCESS
+
+def ioprio_get(pid):
+    """(clase, nivel) de E/S de un proceso, o None"""
+    libc = _libc_syscall()
+    if libc is None:
+        return None
+    syscall, (_, get_number) = libc
+    value = syscall(get_number, 1, pid)
+    return None if value < 0 else (value >> 13, value & 0xff)
+
+class ProcessIsolation:
+    """Afinidad de CPU, nice, ionice y slice cgroup v2 para el árbol de procesos de n8n
+
+    prepare() crea el cgroup. n8n se lanza tras wrap(), que deja al shell esperando
+    en stdin; apply() fija los límites desde el guardian sobre ese PID y release()
+    lo deja hacer exec de n8n, así n8n y todo lo que lance heredan los límites sin
+    ejecutar código Python entre fork y exec.
+    """
+
+    def __init__(self, settings):
+        self.cpu_affinity = self._parse_cpus(settings.get("cpu_affinity"))
+        self.nice = settings.get("nice")
+        self.ionice_class = settings.get("ionice_class")
+        self.ionice_level = settings.get("ionice_level", 4)
+        self.cgroup = settings.get("cgroup")
+        self.cpu_max = settings.get("cpu_max")
+        self.memory_high_mb = settings.get("memory_high_mb")
+        self.cgroup_dir = None
+        self.created_dirs = []
+        if self.ionice_class is not None and self.ionice_class not in IOPRIO_CLASSES:
+            raise ValueError(f"ionice_class debe ser uno de: {', '.join(IOPRIO_CLASSES)}")
+
+    @staticmethod
+    def _parse_cpus(value):
+        """[0, 2] o "0-3,6" -> {0, 1, 2, 3, 6}"""
+        if value is None or isinstance(value, (list, tuple, set)):
+            return set(value) if value is not None else None
+        cpus = set()
+        for part in str(value).split(","):
+            start, _, end = part.strip().partition("-")
+            cpus.update(range(int(start), int(end or start) + 1))
+        return cpus
+
+    @property
+    def active(self):
+        return any(value is not None for value in (self.cpu_affinity, self.nice, self.ionice_class, self.cgroup))
+
+    def prepare(self):
+        """Crear el cgroup y escribir sus límites; devuelve avisos de lo que no se pudo aplicar"""
+        warnings = []
+        if not sys.platform.startswith("linux"):
+            return ["el aislamiento de procesos solo está disponible en Linux"] if self.active else []
+        if self.ionice_class and _libc_syscall() is None:
+            warnings.append(f"ionice no soportado en la arquitectura {os.uname().machine}")
+        if not self.cgroup:
+            return warnings
+
+        if not (CGROUP_ROOT / "cgroup.controllers").exists():
+            return warnings + ["cgroup v2 no está montado en /sys/fs/cgroup"]
+        cgroup_dir = CGROUP_ROOT / self.cgroup.strip("/")
+        try:
+            # Los controladores deben estar habilitados en cada antepasado, desde la raíz
+            parts = cgroup_dir.relative_to(CGROUP_ROOT).parts
+            for ancestor in (CGROUP_ROOT.joinpath(*parts[:depth]) for depth in range(len(parts))):
+                if not ancestor.exists():
+                    ancestor.mkdir()
+                    self.created_dirs.append(ancestor)
+                try:
+                    (ancestor / "cgroup.subtree_control").write_text("+cpu +memory")
+                except OSError:
+                    pass  # Ya habilitados, o delegados por systemd
+            if not cgroup_dir.exists():
+                cgroup_dir.mkdir()
+                self.created_dirs.append(cgroup_dir)
+            if self.cpu_max is not None:
+                cpu_max = self.cpu_max if isinstance(self.cpu_max, str) else f"{int(self.cpu_max * 100000)} 100000"
+                (cgroup_dir / "cpu.max").write_text(cpu_max)
+            if self.memory_high_mb is not None:
+                (cgroup_dir / "memory.high").write_text(str(int(self.memory_high_mb * 1024 * 1024)))
+            self.cgroup_dir = cgroup_dir
+        except OSError as e:
+            warnings.append(f"no se pudo preparar el cgroup {cgroup_dir}: {e.strerror or e} "
+                            "(requiere root o delegación, p. ej. Delegate=yes en systemd)")
+        return warnings
+
+    def cleanup(self):
+        """Borrar los cgroups creados por prepare() una vez que n8n ha terminado"""
+        for directory in reversed(self.created_dirs):
+            try:
+                directory.rmdir()  # Solo funciona si ya no quedan procesos ni cgroups hijos
+            except OSError:
+                break
+            self.created_dirs.remove(directory)
+        if self.cgroup_dir is not None and not self.cgroup_dir.exists():
+            self.cgroup_dir = None
+
+    @staticmethod
+    def wrap(command):
+        """Comando de shell que espera una línea en stdin antes de hacer exec (EOF: no arranca)"""
+        return f"read _ && exec {command}"
+
+    def apply(self, pid):
+        """Fijar los límites sobre `pid` desde el proceso padre; lanza OSError si no se puede"""
+        if self.cgroup_dir is not None:
+            (self.cgroup_dir / "cgroup.procs").write_text(str(pid))
+        if self.cpu_affinity:
+            os.sched_setaffinity(pid, self.cpu_affinity)
+        if self.nice is not None:
+            os.setpriority(os.PRIO_PROCESS, pid, self.nice)
+        if self.ionice_class and _libc_syscall() is not None:
+            if not ioprio_set(pid, IOPRIO_CLASSES[self.ionice_class], self.ionice_level):
+                import ctypes
+                error = ctypes.get_errno()
+                raise OSError(error, f"ioprio_set: {os.strerror(error)}")
+
+    @staticmethod
+    def release(process, start=True):
+        """Dejar que el shell de wrap() haga exec del comando, o que termine sin lanzarlo"""
+        if start:
+            process.stdin.write(b"\n")
+        process.stdin.close()
+
+    @staticmethod
+    def _read(path):
+        try:
+            return path.read_text().strip()
+        except OSError:
+            return None
+
+    def describe(self, pid):
+        """Límites efectivos del proceso `pid`, leídos del kernel"""
+        effective = {}
+        try:
+            effective["cpu_affinity"] = sorted(os.sched_getaffinity(pid))
+            effective["nice"] = os.getpriority(os.PRIO_PROCESS, pid)
+        except (AttributeError, OSError):
+            pass
+        io = ioprio_get(pid)
+        if io is not None:
+            # Clase 0 = sin fijar: el kernel deriva best-effort del nice
+            effective["ionice"] = f"{IOPRIO_NAMES.get(io[0], 'none')}:{io[1]}" if io[0] else "none"
+        cgroup = self._read(Path(f"/proc/{pid}/cgroup")) if (CGROUP_ROOT / "cgroup.controllers").exists() else None
+        relative = next((line[3:] for line in (cgroup or "").splitlines() if line.startswith("0::")), None)
+        if relative is not None:
+            cgroup_dir = CGROUP_ROOT / relative.lstrip("/")
+            effective["cgroup"] = relative
+            effective["cpu_max"] = self._read(cgroup_dir / "cpu.max")
+            effective["memory_high"] = self._read(cgroup_dir / "memory.high")
+            effective["memory_current"] = self._read(cgroup_dir / "memory.current")
+        return effective
+
+    @staticmethod
+    def lower_current_thread(nice=10, idle_io=True):
+        """Inicializador del pool del guardian: sus trabajos (y los npm que lancen) van por detrás de n8n"""
+        get_native_id = getattr(threading, "get_native_id", None)
+        if get_native_id is None or not sys.platform.startswith("linux"):
+            return
+        try:
+            # En Linux nice e ioprio son por hilo; los procesos hijos los heredan del hilo que hace fork
+            os.setpriority(os.PRIO_PROCESS, get_native_id(), nice)
+            if idle_io:
+                ioprio_set(get_native_id(), IOPRIO_CLASSES["idle"])
+        except OSError:
+            pass
+
+def version_key(version):
+    """Clave de orden para versiones tipo 1.93.0 (las partes no numéricas cuentan como 0)"""
+    return tuple(int(part) if part.isdigit() else 0 for part in re.split(r"[.+-]", version))
+
+class PackageCache:
+    """Caché local de tarballs de n8n verificados y prefijos instalados para cambios atómicos
+
+    Estructura bajo `root`:
+        tarballs/n8n-<versión>.tgz    paquetes de `npm pack`, con su integridad sha512 en index.json
+        npm-cache/                    caché de npm (--cache) con el árbol de dependencias resuelto
+        prefixes/<versión>-<fecha>/   instalaciones completas (npm install --global --prefix)
+        current -> prefixes/...       enlace simbólico a la instalación activa
+    Reinstalar o volver atrás instala sin red desde la caché en un prefijo nuevo y
+    cambia el enlace con os.replace, así n8n nunca queda desinstalado.
+    Solo POSIX: en Windows ni el enlace simbólico ni el os.replace sobre él son fiables.
+    """
+
+    SUPPORTED = os.name == 'posix'
+
+    def __init__(self, root, run_command, npm="npm", keep_versions=3):
+        self.root = Path(root)
+        self.run_command = run_command
+        self.npm = npm
+        self.keep_versions = keep_versions
+        self.tarballs_dir = self.root / "tarballs"
+        self.npm_cache = self.root / "npm-cache"
+        self.prefixes_dir = self.root / "prefixes"
+        self.current_link = self.root / "current"
+        self.index_file = self.root / "index.json"
+
+    def _load_index(self):
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"versions": {}, "history": []}
+
+    def _save_index(self, index):
+        self.root.mkdir(parents=True, exist_ok=True)
+        partial = self.index_file.with_name(self.index_file.name + ".part")
+        with open(partial, 'w', encoding='utf-8') as f:
+            json.dump(index, f, indent=2)
+        os.replace(partial, self.index_file)
+
+    def _npm(self, arguments):
+        result = self.run_command(f"{self.npm} {arguments} --cache {shlex.quote(str(self.npm_cache))}")
+        if not result or result.returncode != 0:
+            detail = (result.stderr or result.stdout).strip().splitlines()[-1:] if result else []
+            raise RuntimeError(f"npm {arguments.split()[0]} falló: {detail[0] if detail else 'sin salida'}")
+        return result
+
+    @staticmethod
+    def _integrity(path):
+        import base64
+        digest = hashlib.sha512()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return "sha512-" + base64.b64encode(digest.digest()).decode('ascii')
+
+    def cached_versions(self):
+        return sorted(self._load_index()["versions"], key=version_key)
+
+    def fetch(self, version="latest"):
+        """Descargar el tarball de n8n@version con npm pack y registrar su integridad"""
+        self.tarballs_dir.mkdir(parents=True, exist_ok=True)
+        result = self._npm(f"pack n8n@{version} --json --pack-destination {shlex.quote(str(self.tarballs_dir))}")
+        packed = json.loads(result.stdout)[0]
+        tarball = self.tarballs_dir / packed["filename"]
+        integrity = self._integrity(tarball)
+        if packed.get("integrity") and packed["integrity"] != integrity:
+            tarball.unlink()
+            raise RuntimeError(f"integridad incorrecta para {tarball.name}")
+
+        index = self._load_index()
+        index["versions"][packed["version"]] = {
+            "tarball": tarball.name,
+            "integrity": integrity,
+            "fetched": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        self._save_index(index)
+        return packed["version"]
+
+    def verify(self, version):
+        """Comprobar que el tarball en caché sigue intacto"""
+        entry = self._load_index()["versions"].get(version)
+        if not entry:
+            return False
+        tarball = self.tarballs_dir / entry["tarball"]
+        return tarball.exists() and self._integrity(tarball) == entry["integrity"]
+
+    def stage(self, version, offline=True):
+        """Instalar una versión en caché en un prefijo nuevo, sin tocar la instalación activa"""
+        if not self.verify(version):
+            raise RuntimeError(f"n8n {version} no está en caché o su tarball está dañado")
+        tarball = self.tarballs_dir / self._load_index()["versions"][version]["tarball"]
+        prefix = self.prefixes_dir / f"{version}-{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+        prefix.mkdir(parents=True)
+        network = "--offline" if offline else "--prefer-offline"
+        try:
+            self._npm(f"install --global --prefix {shlex.quote(str(prefix))} {shlex.quote(str(tarball))} "
+                      f"{network} --no-audit --no-fund")
+            if not self.bin_path(prefix).exists():
+                raise RuntimeError(f"la instalación en {prefix} no contiene el ejecutable de n8n")
+        except Exception:
+            self._remove(prefix)
+            raise
+        return prefix
+
+    def activate(self, prefix):
+        """Apuntar `current` al prefijo de forma atómica (symlink temporal + os.replace)"""
+        staging_link = self.root / "current.tmp"
+        if staging_link.is_symlink():
+            staging_link.unlink()
+        os.symlink(Path(prefix).relative_to(self.root), staging_link)
+        os.replace(staging_link, self.current_link)
+
+        index = self._load_index()
+        index["history"] = [name for name in index["history"] if name != Path(prefix).name] + [Path(prefix).name]
+        self._save_index(index)
+
+    def current(self):
+        """(versión, prefijo) de la instalación activa, o None"""
+        if not self.current_link.is_symlink():
+            return None
+        prefix = self.current_link.resolve()
+        return prefix.name.rsplit("-", 1)[0], prefix
+
+    def bin_path(self, prefix=None):
+        prefix = Path(prefix) if prefix else self.current_link
+        return prefix / "bin" / "n8n"
+
+    def installed_prefix(self, version):
+        """Prefijo preinstalado más reciente de `version` que conserve el ejecutable, o None"""
+        if not self.prefixes_dir.exists():
+            return None
+        prefixes = sorted(prefix for prefix in self.prefixes_dir.iterdir()
+                          if prefix.name.rsplit("-", 1)[0] == version and self.bin_path(prefix).exists())
+        return prefixes[-1] if prefixes else None
+
+    def install(self, version, offline=True, fresh=False):
+        """Activar `version` desde la caché (descargándola si falta); devuelve (versión, prefijo)
+
+        Sin `fresh`, un prefijo ya preinstalado de esa versión se activa directamente.
+        """
+        existing = None if fresh else self.installed_prefix(version)
+        if existing is not None:
+            self.activate(existing)
+            return version, existing
+        if not self.verify(version):
+            version = self.fetch(version)
+            offline = False  # Primera vez: npm resuelve y guarda las dependencias en npm-cache
+        try:
+            prefix = self.stage(version, offline=offline)
+        except RuntimeError:
+            if not offline:
+                raise
+            # Faltan dependencias en npm-cache: completar desde la red una sola vez
+            prefix = self.stage(version, offline=False)
+        self.activate(prefix)
+        self.prune()
+        return version, prefix
+
+    def rollback(self):
+        """Volver al prefijo activado anteriormente que siga existiendo"""
+        current = self.current()
+        history = [name for name in self._load_index()["history"]
+                   if (self.prefixes_dir / name).exists() and (not current or name != current[1].name)]
+        if not history:
+            raise RuntimeError("no hay una instalación anterior a la que volver")
+        prefix = self.prefixes_dir / history[-1]
+        self.activate(prefix)
+        return self.current()
+
+    def _remove(self, path):
+        import shutil
+        shutil.rmtree(path, ignore_errors=True)
+
+    def prune(self):
+        """Conservar las últimas `keep_versions` versiones (tarballs y prefijos)
+
+        npm-cache no se puede podar por versión: si se elimina alguna, se vacía entera.
+        Las versiones conservadas siguen instaladas en sus prefijos, y una reinstalación
+        limpia de ellas la vuelve a llenar desde la red una vez (ver install()).
+        """
+        index = self._load_index()
+        removed = False
+        current = self.current()
+        keep = set(sorted(index["versions"], key=version_key)[-self.keep_versions:])
+        if current:
+            keep.add(current[0])
+        for version in list(index["versions"]):
+            if version not in keep:
+                tarball = self.tarballs_dir / index["versions"].pop(version)["tarball"]
+                if tarball.exists():
+                    tarball.unlink()
+                removed = True
+        if self.prefixes_dir.exists():
+            # De cada versión conservada basta con el prefijo más reciente. El activo y el
+            # anterior se conservan siempre: rollback, y un n8n en marcha puede usar el anterior
+            protected = set(index["history"][-2:])
+            newest = {}
+            for prefix in sorted(self.prefixes_dir.iterdir()):
+                newest[prefix.name.rsplit("-", 1)[0]] = prefix.name
+            for prefix in self.prefixes_dir.iterdir():
+                version = prefix.name.rsplit("-", 1)[0]
+                if prefix.name not in protected and (version not in keep or newest[version] != prefix.name):
+                    self._remove(prefix)
+        index["history"] = [name for name in index["history"] if (self.prefixes_dir / name).exists()]
+        self._save_index(index)
+        if removed and self.npm_cache.exists():
+            self._remove(self.npm_cache)
+        return removed
+
+def tail_lines(path, count=10, block_size=65536):
+    """Leer las últimas `count` líneas de un archivo sin recorrerlo entero"""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        data = b""
+        while position > 0 and data.count(b"\n") <= count:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            data = f.read(read_size) + data
+    lines = data.decode('utf-8', errors='replace').splitlines()
+    return lines[-count:] if count else []
+
+# Configuración por defecto (se puede sobrescribir con un archivo JSON vía --config)
+DEFAULT_CONFIG = {
+    "guardian_dir": None,          # None = ./n8n_guardian_data
+    "n8n_url": "http://localhost:5678",
+    "control_socket": None,        # None = <guardian_dir>/guardian.sock
+    "restart_on_crash": True,
+    "restart_backoff_max": 300,
+    "auto_restart": False,         # Modo interactivo: reiniciar n8n tras una caída como en el daemon
+    # Núcleo de supervisión (segundos)
+    "startup_grace_s": 8,              # Espera máxima de arranque si n8n aún no responde por HTTP
+    "health_path": "/healthz",
+    "probe_interval_s": 30,
+    "probe_failure_threshold": 3,
+    "sample_interval_s": 10,
+    "heartbeat_interval_s": 300,
+    # Base de datos de ejecuciones (SQLite) de n8n
+    "n8n_data_dir": None,          # None = ~/.n8n o $N8N_USER_FOLDER/.n8n
+    "db_sample_interval_s": 600,
+    "db_size_warning_mb": 1024,
+    "db_prune": {
+        "enabled": False,          # Poda automática durante la supervisión
+        "older_than_days": 14,
+        "batch_size": 500,
+        "time_budget_s": 30,
+        "pause_s": 0.2,
+        "interval_s": 3600,
+    },
+    # Backups incrementales de la carpeta de datos de n8n
+    "backup_keep": 10,
+    "backup_chunk_size_mb": 4,
+    # Alertas: destinos {"type": "webhook", "url"}, {"type": "command", "command"}, {"type": "file", "path"}
+    "alerts": {
+        "sinks": [],
+        "min_severity": "warning",     # info, warning o critical
+        "window_s": 30,                # Los eventos se agrupan en lotes por ventana
+        "dedup_s": 600,                # Una misma huella no se repite en este plazo
+        "rate_per_minute": 6,          # Token bucket por destino
+        "burst": 3,
+        "timeout_s": 10,
+    },
+    # Caché local de paquetes de n8n: instalación en prefijos propios con cambio atómico
+    "package_cache": {
+        "enabled": False,
+        "keep_versions": 3,
+    },
+    # Aislamiento del proceso n8n (Linux): el guardian lo aplica antes de que arranque n8n
+    "isolation": {
+        "cpu_affinity": None,          # [2, 3] o "2-3"
+        "nice": None,                  # -20..19 (valores negativos requieren root)
+        "ionice_class": None,          # best-effort, idle o realtime
+        "ionice_level": 4,
+        "cgroup": None,                # Ruta bajo /sys/fs/cgroup, p. ej. "n8n-guardian.slice/n8n"
+        "cpu_max": None,               # CPUs (1.5) o valor literal de cpu.max ("150000 100000")
+        "memory_high_mb": None,
+        "background_nice": 10,         # Prioridad de los trabajos propios (auditorías, backups...); None = sin cambio
+        "background_io_idle": True,
+    },
+    # Registro npm para comprobar versiones (None = $npm_config_registry o registry.npmjs.org)
+    "registry_url": None,
+    "registry_cache_ttl_s": 3600,
+    # Respuestas a las preguntas S/N cuando no hay nadie delante (modo daemon)
+    "decisions": {
+        "reinstall_n8n": False,
+        "update_n8n": False,
+        "start_n8n": True,
+        "continue_without_backup": False,
+    },
+}
+
+def load_config(path):
+    """Cargar configuración JSON combinada con los valores por defecto"""
+    config = json.loads(json.dumps(DEFAULT_CONFIG))
+    if path:
+        with open(path, 'r', encoding='utf-8') as f:
+            user_config = json.load(f)
+        for key, value in user_config.items():
+            # Las secciones anidadas ("decisions", "db_prune"...) se combinan clave a clave
+            if isinstance(value, dict) and isinstance(config.get(key), dict):
+                config[key].update(value)
+            else:
+                config[key] = value
+    return config
+
+# Comandos aceptados por el socket de control del modo daemon
+CONTROL_COMMANDS = ("status", "logs", "security", "audit", "db", "dbprune", "backup", "backups", "stop", "help")
+
+def send_control_command(socket_path, command, timeout=30):
+    """Enviar un comando al socket de control de un guardian en modo daemon"""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.settimeout(timeout)
+            client.connect(str(socket_path))
+            client.sendall((command.strip() + "\n").encode('utf-8'))
+            data = b""
+            while not data.endswith(b"\n"):
+                chunk = client.recv(65536)
+                if not chunk:
+                    break
+                data += chunk
+        return json.loads(data.decode('utf-8'))
+    except (OSError, ValueError):
+        return None
+
+def _resolve_future(future, result, exception):
+    """Completar un future desde call_soon_threadsafe si nadie lo canceló"""
+    if future.done():
+        return
+    if exception is not None:
+        future.set_exception(exception)
+    else:
+        future.set_result(result)
+
+class N8NGuardian:
+    def __init__(self, config=None, daemon=False):
+        self.config = config or load_config(None)
+        self.daemon = daemon  # Sin preguntas: las decisiones salen de la configuración
+
         # Directorio de trabajo por defecto (puedes cambiar esta ruta)
-        self.guardian_dir = Path.cwd() / "n8n_guardian_data"
+        self.guardian_dir = Path(self.config["guardian_dir"]) if self.config.get("guardian_dir") else Path.cwd() / "n8n_guardian_data"
         self.log_file = self.guardian_dir / "n8n_guardian.log"
         self.security_log = self.guardian_dir / "security_audit.log"
         self.monitoring = False
         self.n8n_process = None
         self.npm_path = "npm"  # Puede actualizarse si se encuentra en ruta específica
         self.n8n_path = "n8n"  # Puede actualizarse si se encuentra en ruta específica
+        self.n8n_url = self.config.get("n8n_url", "http://localhost:5678").rstrip('/')
+        self.control_socket = Path(self.config["control_socket"]) if self.config.get("control_socket") else self.guardian_dir / "guardian.sock"
+        self.started_at = None
+        self.restart_count = 0
+        self.last_audit = None
+        self.n8n_output_log = self.guardian_dir / "n8n_output.log"
+        self.last_probe = None
+        self.last_sample = None
+        self.samples_taken = 0
+        self.n8n_data_dir = Path(self.config["n8n_data_dir"]) if self.config.get("n8n_data_dir") else default_n8n_data_dir()
+        self.execution_db = self.n8n_data_dir / "database.sqlite"
+        self.db_stats_file = self.guardian_dir / "db_stats.jsonl"
+        self.last_db_stats = None
+        self._prune_lock = threading.Lock()
+        self.backup_store = SnapshotStore(self.guardian_dir / "backups",
+                                          chunk_size=int(self.config.get("backup_chunk_size_mb", 4) * 1024 * 1024))
+        self._backup_lock = threading.Lock()
+        registry_url = (self.config.get("registry_url") or os.environ.get("npm_config_registry")
+                        or os.environ.get("NPM_CONFIG_REGISTRY") or DEFAULT_REGISTRY)
+        self.registry = RegistryClient(registry_url, self.guardian_dir / "registry_cache.json",
+                                       ttl_s=self.config.get("registry_cache_ttl_s", 3600))
+        self.packages = PackageCache(self.guardian_dir / "packages", self.run_command,
+                                     keep_versions=self.config["package_cache"].get("keep_versions", 3))
+        self.managed_install = bool(self.config["package_cache"].get("enabled"))
+        if self.managed_install and not PackageCache.SUPPORTED:
+            print(f"{Colors.ERROR}❌ package_cache solo está soportado en Linux/macOS; se usa npm install -g{Colors.NORMAL}")
+            self.managed_install = False
+        if self.managed_install and self.packages.current():
+            self.n8n_path = shlex.quote(str(self.packages.bin_path()))
+        try:
+            self.isolation = ProcessIsolation(self.config["isolation"])
+        except (TypeError, ValueError) as e:
+            print(f"{Colors.ERROR}❌ Configuración de aislamiento inválida: {e}{Colors.NORMAL}")
+            self.isolation = ProcessIsolation({})
+        alert_settings = dict(self.config["alerts"])
+        try:
+            self.alerts = AlertManager(alert_settings.pop("sinks"), **alert_settings)
+        except (TypeError, ValueError) as e:
+            print(f"{Colors.ERROR}❌ Configuración de alertas inválida: {e}{Colors.NORMAL}")
+            self.alerts = AlertManager([])
+        self._loop = None
+        self._stop_event = None
+        self._pumps = []
+        self._console_thread = None
         
         # Crear directorio si no existe
         self.guardian_dir.mkdir(exist_ok=True, parents=True)
         
-        # Configurar logging
-        self.setup_logging()
+        # El logging se configura en el primer mensaje (ver la propiedad logger)
+        self._logger = None
         
+    @property
+    def logger(self):
+        if self._logger is None:
+            self.setup_logging()
+        return self._logger
+    
     def setup_logging(self):
         """Configurar sistema de logs"""
         logging.basicConfig(
@@ -66,7 +1890,7 @@ class N8NGuardian:
                 logging.StreamHandler()
             ]
         )
-        self.logger = logging.getLogger(__name__)
+        self._logger = logging.getLogger(__name__)
     
     def print_header(self):
         """Mostrar header del programa"""
@@ -107,17 +1931,34 @@ class N8NGuardian:
         clean_message = message.replace('🔍', '').replace('✅', '').replace('❌', '').replace('⚠️', '').replace('🚀', '').replace('📦', '').replace('🔒', '').strip()
         getattr(self.logger, actual_level)(clean_message)
     
+    def ask_yes_no(self, question, decision, default=False):
+        """Pregunta S/N; en modo daemon la respuesta sale de config["decisions"]"""
+        if self.daemon:
+            answer = bool(self.config.get("decisions", {}).get(decision, default))
+            self.log_and_print(f"🤖 {question} -> {'S' if answer else 'N'} (decisión '{decision}' de la configuración)", "info")
+            return answer
+        
+        while True:
+            choice = input(f"{Colors.BOLD}{question} (S/N): {Colors.NORMAL}").strip().lower()
+            if choice in ['s', 'sí', 'si', 'y', 'yes']:
+                return True
+            elif choice in ['n', 'no']:
+                return False
+            else:
+                print(f"{Colors.ERROR}Por favor responde S o N{Colors.NORMAL}")
+    
     def run_command(self, command, capture_output=True, check=False):
         """Ejecutar comando con manejo de errores"""
         try:
-            result = subprocess.run(
-                command, 
-                capture_output=capture_output, 
-                text=True, 
-                check=check,
-                encoding='utf-8',
-                shell=True  # Usar shell para heredar PATH correctamente
-            )
+            with TRACER.span("run_command", command=command):
+                result = subprocess.run(
+                    command, 
+                    capture_output=capture_output, 
+                    text=True, 
+                    check=check,
+                    encoding='utf-8',
+                    shell=True  # Usar shell para heredar PATH correctamente
+                )
             return result
         except subprocess.CalledProcessError as e:
             self.log_and_print(f"❌ Error ejecutando comando: {command}", "error")
@@ -137,6 +1978,7 @@ class N8NGuardian:
             self.log_and_print(f"❌ Error inesperado ejecutando comando: {str(e)}", "error")
             return None
     
+    @traced()
     def diagnose_path_issue(self, command):
         """Diagnosticar problemas de PATH"""
         self.log_and_print(f"🔍 Diagnosticando problema con {command}...", "warning")
@@ -175,6 +2017,7 @@ class N8NGuardian:
         self.log_and_print(f"❌ No se pudo encontrar {command} en el sistema", "error")
         return None
     
+    @traced()
     def check_node_installed(self):
         """Verificar si Node.js está instalado"""
         self.log_and_print("🔍 Verificando Node.js...", "info")
@@ -204,19 +2047,21 @@ class N8NGuardian:
         print(f"{Colors.INFO}n8n requiere Node.js 18 o superior para funcionar.{Colors.NORMAL}")
         print(f"{Colors.INFO}🌐 Puedes descargarlo desde: https://nodejs.org{Colors.NORMAL}")
         
-        while True:
-            choice = input(f"\n{Colors.BOLD}¿Quieres abrir la página de descarga ahora? (S/N): {Colors.NORMAL}").strip().lower()
-            if choice in ['s', 'sí', 'si', 'y', 'yes']:
-                webbrowser.open('https://nodejs.org/es/')
-                self.log_and_print("🌐 Página de descarga abierta en el navegador", "info")
-                input(f"{Colors.WARNING}Presiona Enter después de instalar Node.js...{Colors.NORMAL}")
-                return self.check_node_installed()  # Verificar de nuevo
-            elif choice in ['n', 'no']:
-                self.log_and_print("❌ Instalación cancelada. No se puede continuar sin Node.js", "error")
-                return False
-            else:
-                print(f"{Colors.ERROR}Por favor responde S o N{Colors.NORMAL}")
+        if self.daemon:
+            self.log_and_print("❌ Modo daemon: instala Node.js 18+ y reinicia el servicio", "error")
+            return False
+        
+        print()
+        if self.ask_yes_no("¿Quieres abrir la página de descarga ahora?", "open_node_download"):
+            webbrowser.open('https://nodejs.org/es/')
+            self.log_and_print("🌐 Página de descarga abierta en el navegador", "info")
+            input(f"{Colors.WARNING}Presiona Enter después de instalar Node.js...{Colors.NORMAL}")
+            return self.check_node_installed()  # Verificar de nuevo
+        
+        self.log_and_print("❌ Instalación cancelada. No se puede continuar sin Node.js", "error")
+        return False
     
+    @traced()
     def check_npm_installed(self):
         """Verificar si npm está instalado"""
         self.log_and_print("🔍 Verificando npm...", "info")
@@ -249,10 +2094,21 @@ class N8NGuardian:
             self.log_and_print("   3. Verificar variables de entorno PATH", "info")
             return False
     
+    @traced()
     def check_n8n_executable(self):
         """Verificar si n8n es ejecutable directamente"""
         self.log_and_print("🔍 Verificando ejecutabilidad de n8n...", "info")
         
+        # Instalación gestionada por la caché de paquetes: si está rota, repararla sin red
+        current = self.packages.current() if self.managed_install else None
+        if current:
+            result = self.run_command(f"{self.n8n_path} --version")
+            if result and result.returncode == 0:
+                self.log_and_print(f"✅ n8n {result.stdout.strip()} ejecutable desde {current[1]}", "success")
+                return True
+            self.log_and_print(f"⚠️ La instalación gestionada de n8n {current[0]} no responde, reparando desde la caché...", "warning")
+            return self.install_from_cache(current[0], fresh=True)
+        
         # Primero intentar con n8n normal
         result = self.run_command("n8n --version")
         if result and result.returncode == 0:
@@ -290,20 +2146,26 @@ class N8NGuardian:
             self.log_and_print("   3. Verificar PATH y permisos", "info")
             
             # Preguntar si quiere intentar reinstalar
-            while True:
-                choice = input(f"{Colors.BOLD}¿Quieres intentar reinstalar n8n? (S/N): {Colors.NORMAL}").strip().lower()
-                if choice in ['s', 'sí', 'si', 'y', 'yes']:
-                    return self.reinstall_n8n()
-                elif choice in ['n', 'no']:
-                    self.log_and_print("❌ No se puede continuar sin n8n ejecutable", "error")
-                    return False
-                else:
-                    print(f"{Colors.ERROR}Por favor responde S o N{Colors.NORMAL}")
+            if self.ask_yes_no("¿Quieres intentar reinstalar n8n?", "reinstall_n8n"):
+                return self.reinstall_n8n()
+            
+            self.log_and_print("❌ No se puede continuar sin n8n ejecutable", "error")
+            return False
     
     def reinstall_n8n(self):
         """Reinstalar n8n globalmente"""
+        if not self.backup_before_change("reinstalación"):
+            self.log_and_print("⏭️ Reinstalación cancelada", "info")
+            return False
+        
         self.log_and_print("🔄 Reinstalando n8n...", "info")
         
+        if self.managed_install:
+            # Sin ventana de desinstalación: se instala al lado y se cambia el enlace
+            current = self.packages.current()
+            version = current[0] if current else (self.get_installed_n8n_version() or "latest")
+            return self.install_from_cache(version, fresh=True) and self.check_n8n_executable()
+        
         # Primero desinstalar
         result = self.run_command(f"{self.npm_path} uninstall -g n8n")
         if result:
@@ -322,6 +2184,8 @@ class N8NGuardian:
     
     def get_installed_n8n_version(self):
         """Obtener versión instalada de n8n"""
+        if self.managed_install and self.packages.current():
+            return self.packages.current()[0]
         result = self.run_command(f"{self.npm_path} list -g n8n --depth=0")
         if result and result.returncode == 0:
             for line in result.stdout.split('\n'):
@@ -329,8 +2193,17 @@ class N8NGuardian:
                     return line.split('@')[1].strip()
         return None
     
+    @traced()
     def get_latest_n8n_version(self):
-        """Obtener última versión disponible de n8n"""
+        """Obtener última versión disponible de n8n (registro en proceso, npm view como respaldo)"""
+        try:
+            tags, origin = self.registry.dist_tags("n8n")
+            if tags.get("latest"):
+                self.logger.info(f"Última versión de n8n desde el registro ({origin}): {tags['latest']}")
+                return tags["latest"]
+        except Exception as e:
+            self.logger.warning(f"Registro npm no disponible ({self.registry.registry_url}): {e}; usando npm view")
+        
         result = self.run_command(f"{self.npm_path} view n8n version")
         if result and result.returncode == 0:
             return result.stdout.strip()
@@ -351,6 +2224,7 @@ class N8NGuardian:
         except:
             return True  # En caso de duda, actualizar
     
+    @traced()
     def check_and_update_n8n(self):
         """Verificar y actualizar n8n si es necesario"""
         self.log_and_print("🔍 Verificando estado de n8n...", "info")
@@ -377,21 +2251,21 @@ class N8NGuardian:
         if self.compare_versions(current_version, latest_version):
             print(f"\n{Colors.WARNING}🔄 Nueva versión disponible: v{current_version} → v{latest_version}{Colors.NORMAL}")
             
-            while True:
-                choice = input(f"{Colors.BOLD}¿Quieres actualizar n8n? (S/N): {Colors.NORMAL}").strip().lower()
-                if choice in ['s', 'sí', 'si', 'y', 'yes']:
-                    return self.update_n8n()
-                elif choice in ['n', 'no']:
-                    self.log_and_print("⏭️ Actualización omitida", "info")
-                    return True
-                else:
-                    print(f"{Colors.ERROR}Por favor responde S o N{Colors.NORMAL}")
+            if self.ask_yes_no("¿Quieres actualizar n8n?", "update_n8n"):
+                return self.update_n8n()
+            
+            self.log_and_print("⏭️ Actualización omitida", "info")
+            return True
         else:
             self.log_and_print("✅ n8n está actualizado", "success")
             return True
     
     def install_n8n(self):
         """Instalar n8n"""
+        if self.managed_install:
+            self.log_and_print("📦 Instalando n8n en la caché de paquetes del guardian...", "info")
+            return self.install_from_cache("latest")
+        
         self.log_and_print("📦 Instalando n8n globalmente...", "info")
         
         result = self.run_command(f"{self.npm_path} install -g n8n")
@@ -404,8 +2278,15 @@ class N8NGuardian:
     
     def update_n8n(self):
         """Actualizar n8n"""
+        if not self.backup_before_change("actualización"):
+            self.log_and_print("⏭️ Actualización cancelada", "info")
+            return False
+        
         self.log_and_print("🔄 Actualizando n8n...", "info")
         
+        if self.managed_install:
+            return self.install_from_cache("latest")
+        
         result = self.run_command(f"{self.npm_path} update -g n8n")
         if result and result.returncode == 0:
             self.log_and_print("✅ n8n actualizado exitosamente", "success")
@@ -414,6 +2295,66 @@ class N8NGuardian:
             self.log_and_print("❌ Error actualizando n8n", "error")
             return False
     
+    @traced()
+    def install_from_cache(self, version, offline=True, fresh=False):
+        """Instalar n8n desde la caché local y activarlo de forma atómica (fresh: prefijo nuevo)"""
+        self.packages.npm = self.npm_path
+        start = time.monotonic()
+        try:
+            version, prefix = self.packages.install(version, offline=offline, fresh=fresh)
+        except Exception as e:
+            self.log_and_print(f"❌ Error instalando n8n {version} desde la caché: {str(e)}", "error")
+            return False
+        
+        self.n8n_path = shlex.quote(str(self.packages.bin_path()))
+        self.log_and_print(f"✅ n8n {version} activo desde {prefix} ({time.monotonic() - start:.1f}s)", "success")
+        if self.is_n8n_running():
+            self.log_and_print("🔄 n8n sigue ejecutando la versión anterior: reinícialo para usar la nueva", "info")
+        return True
+    
+    def cache_n8n_package(self, version="latest"):
+        """Descargar y preinstalar una versión (sin activarla) para poder usarla después sin red"""
+        self.packages.npm = self.npm_path
+        self.log_and_print(f"📦 Guardando n8n@{version} en la caché de paquetes...", "info")
+        try:
+            version = self.packages.fetch(version)
+            self.packages.stage(version, offline=False)
+            self.packages.prune()
+        except Exception as e:
+            self.log_and_print(f"❌ Error guardando n8n@{version} en la caché: {str(e)}", "error")
+            return None
+        self.log_and_print(f"✅ n8n {version} verificado y preinstalado en la caché", "success")
+        return version
+    
+    def rollback_n8n(self):
+        """Volver a la instalación de n8n activada anteriormente"""
+        if not self.backup_before_change("vuelta atrás"):
+            self.log_and_print("⏭️ Vuelta atrás cancelada", "info")
+            return False
+        try:
+            version, prefix = self.packages.rollback()
+        except Exception as e:
+            self.log_and_print(f"❌ No se pudo volver atrás: {str(e)}", "error")
+            return False
+        self.n8n_path = shlex.quote(str(self.packages.bin_path()))
+        self.log_and_print(f"⏪ n8n {version} activo de nuevo ({prefix})", "success")
+        return True
+    
+    def list_packages(self):
+        """Mostrar las versiones de n8n en la caché local"""
+        current = self.packages.current()
+        versions = self.packages.cached_versions()
+        if not versions:
+            self.log_and_print("ℹ️ La caché de paquetes está vacía", "info")
+            return []
+        print(f"\n{Colors.INFO}📦 Versiones de n8n en {self.packages.root}:{Colors.NORMAL}")
+        for version in reversed(versions):
+            marker = "*" if current and current[0] == version else " "
+            state = "OK" if self.packages.verify(version) else "DAÑADO"
+            print(f"  {marker} {version:<12} {state}")
+        return versions
+    
+    @traced()
     def security_audit(self):
         """Realizar auditoría de seguridad completa"""
         self.log_and_print("🔒 Ejecutando auditoría de seguridad...", "info")
@@ -464,6 +2405,7 @@ class N8NGuardian:
             
             if not has_vulnerabilities or not has_vuln_keywords:
                 self.log_and_print("✅ Excelente: No se encontraron vulnerabilidades", "success")
+                self.last_audit = {"timestamp": security_timestamp, "status": "clean"}
                 
                 # Registrar en log de seguridad
                 try:
@@ -476,6 +2418,14 @@ class N8NGuardian:
                     
             else:
                 self.log_and_print("⚠️ Se encontraron vulnerabilidades de seguridad:", "warning")
+                self.last_audit = {
+                    "timestamp": security_timestamp,
+                    "status": "vulnerable",
+                    "summary": audit_output.strip().splitlines()[-1] if audit_output.strip() else "",
+                }
+                # La huella incluye el resumen: el mismo informe no se repite, uno distinto sí
+                self.alerts.emit("vulnerabilities", "warning", f"npm audit: {self.last_audit['summary']}",
+                                 fingerprint=f"vulnerabilities:{self.last_audit['summary']}")
                 
                 # Solo mostrar si realmente hay contenido
                 if len(audit_output) > 20:
@@ -501,6 +2451,8 @@ class N8NGuardian:
                     pass
         else:
             self.log_and_print("❌ No se pudo ejecutar la auditoría de seguridad", "error")
+            self.last_audit = {"timestamp": security_timestamp, "status": "error"}
+            self.alerts.emit("audit_error", "warning", "No se pudo ejecutar la auditoría de seguridad")
             try:
                 with open(self.security_log, 'a', encoding='utf-8') as f:
                     f.write("RESULTADO: ❌ ERROR EN AUDITORÍA\n")
@@ -594,73 +2546,128 @@ class N8NGuardian:
         except:
             pass
     
+    @traced()
     def start_n8n_monitoring(self):
-        """Iniciar n8n con monitoreo en segundo plano"""
-        self.log_and_print("🚀 Iniciando n8n...", "info")
+        """Iniciar n8n y supervisarlo en un bucle de eventos asyncio hasta que se detenga"""
+        try:
+            return asyncio.run(self.supervise())
+        except Exception as e:
+            self.log_and_print(f"❌ Error inesperado en la supervisión: {str(e)}", "error")
+            return False
+    
+    def is_n8n_running(self):
+        """True si el proceso n8n supervisado sigue vivo"""
+        return self.n8n_process is not None and self.n8n_process.returncode is None
+    
+    async def supervise(self, interactive=None):
+        """Núcleo de supervisión: todas las tareas comparten un único bucle de eventos"""
+        if interactive is None:
+            interactive = not self.daemon
+        
+        self._loop = asyncio.get_event_loop()
+        self._stop_event = asyncio.Event()
+        self._relaunched = asyncio.Event()
+        self._audit_lock = asyncio.Lock()
+        # Pool fijo para el trabajo bloqueante (npm audit, lecturas de logs...)
+        isolation = self.config["isolation"]
+        background = {}
+        if isolation.get("background_nice") is not None:
+            background = {"initializer": ProcessIsolation.lower_current_thread,
+                          "initargs": (isolation["background_nice"], bool(isolation.get("background_io_idle")))}
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix="guardian-job",
+                                                               **background)
+        # Un hilo aparte, sin rebajar, para el trabajo que no debe quedarse atrás (run_foreground)
+        self._foreground_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1,
+                                                                          thread_name_prefix="guardian-fg")
+        self.alerts.executor = self._executor
         
+        handled_signals = []
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                self._loop.add_signal_handler(sig, self._on_stop_signal)
+                handled_signals.append(sig)
+            except (NotImplementedError, RuntimeError):
+                pass  # Windows: sin manejadores de señales en el bucle
+        
+        tasks = []
         try:
-            # Usar la ruta correcta de n8n y shell=True para compatibilidad
-            n8n_command = self.n8n_path
-            
-            self.log_and_print(f"🔍 Ejecutando comando: {n8n_command}", "info")
-            
-            # Iniciar n8n en un proceso separado con shell=True
-            self.n8n_process = subprocess.Popen(
-                n8n_command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                bufsize=1,
-                universal_newlines=True,
-                shell=True  # Crucial para Windows y PATH
-            )
+            if not await self.launch_n8n():
+                return False
             
-            # Esperar un momento para que se inicie
-            self.log_and_print("⏳ Esperando que n8n se inicie...", "info")
-            time.sleep(5)
+            self.monitoring = True
+            self.log_and_print("👀 Monitoreo en segundo plano iniciado", "info")
+            tasks = [
+                asyncio.ensure_future(self._watch_process()),
+                asyncio.ensure_future(self._probe_health()),
+                asyncio.ensure_future(self._sample_resources()),
+                asyncio.ensure_future(self._heartbeat()),
+                asyncio.ensure_future(self._monitor_database()),
+                asyncio.ensure_future(self.alerts.run()),
+            ]
+            if self.daemon:
+                tasks.append(asyncio.ensure_future(self._control_server()))
+            if interactive:
+                tasks.append(asyncio.ensure_future(self.interactive_session()))
             
-            # Verificar que se inició correctamente
-            if self.n8n_process.poll() is None:
-                self.log_and_print("✅ n8n iniciado exitosamente", "success")
-                self.log_and_print("🌐 Acceso: http://localhost:5678", "info")
-                self.log_and_print("💡 Presiona 'o' + Enter en la consola de n8n para abrir el navegador", "info")
-                
-                # Esperar un poco más y verificar que siga corriendo
-                time.sleep(3)
-                if self.n8n_process.poll() is None:
-                    self.log_and_print("✅ n8n funcionando establemente", "success")
-                    
-                    # Iniciar monitoreo en segundo plano
-                    self.monitoring = True
-                    monitor_thread = threading.Thread(target=self.monitor_n8n, daemon=True)
-                    monitor_thread.start()
-                    
-                    return True
-                else:
-                    self.log_and_print("❌ n8n se cerró inesperadamente durante el inicio", "error")
-                    
-                    # Intentar leer los errores
-                    if self.n8n_process.stderr:
-                        stderr = self.n8n_process.stderr.read()
-                        if stderr:
-                            self.log_and_print(f"❌ Error de n8n: {stderr}", "error")
-                    
-                    return False
-            else:
-                self.log_and_print("❌ n8n no se pudo iniciar", "error")
-                
-                # Leer errores si los hay
-                try:
-                    stdout, stderr = self.n8n_process.communicate(timeout=2)
-                    if stdout:
-                        self.log_and_print(f"📄 Stdout: {stdout}", "info")
-                    if stderr:
-                        self.log_and_print(f"❌ Stderr: {stderr}", "error")
-                except subprocess.TimeoutExpired:
-                    pass
-                
-                return False
-                
+            await self._stop_event.wait()
+            return True
+        finally:
+            self.monitoring = False
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self._terminate_n8n()
+            self.isolation.cleanup()
+            await self.alerts.drain()
+            for sig in handled_signals:
+                self._loop.remove_signal_handler(sig)
+            self._executor.shutdown(wait=False)
+            self._foreground_executor.shutdown(wait=False)
+            self._loop = None
+            self.log_and_print("👀 Monitoreo detenido", "info")
+    
+    def _on_stop_signal(self):
+        print(f"\n{Colors.WARNING}Señal de parada recibida. Deteniendo...{Colors.NORMAL}")
+        self.stop_n8n()
+    
+    async def run_blocking(self, function, *args):
+        """Ejecutar una función bloqueante en el pool del guardian sin frenar el bucle"""
+        return await self._loop.run_in_executor(self._executor, function, *args)
+    
+    async def run_foreground(self, function, *args):
+        """Como run_blocking, pero con prioridad normal aunque el pool del guardian esté rebajado
+
+        Para trabajo que no debe quedarse atrás: la poda retiene el bloqueo de escritura
+        de la base de n8n, y abrir el navegador es interactivo.
+        """
+        return await self._loop.run_in_executor(self._foreground_executor, function, *args)
+    
+    @traced(track="supervisión")
+    async def launch_n8n(self):
+        """Lanzar el proceso n8n y esperar a que responda o se mantenga estable"""
+        self.log_and_print("🚀 Iniciando n8n...", "info")
+        
+        # Usar la ruta correcta de n8n a través del shell para compatibilidad (Windows y PATH)
+        n8n_command = self.n8n_path
+        self.log_and_print(f"🔍 Ejecutando comando: {n8n_command}", "info")
+        
+        # En POSIX, n8n va en su propia sesión para poder señalar al shell y a sus hijos juntos
+        session = {"start_new_session": True} if os.name == 'posix' else {}
+        isolated = self.isolation.active and sys.platform.startswith("linux")
+        if self.isolation.active:
+            for warning in self.isolation.prepare():
+                self.log_and_print(f"⚠️ Aislamiento: {warning}", "warning")
+        if isolated:
+            # El shell espera en stdin a que el guardian le aplique los límites antes del exec
+            n8n_command = self.isolation.wrap(n8n_command)
+            session["stdin"] = asyncio.subprocess.PIPE
+        try:
+            self.n8n_process = await asyncio.create_subprocess_shell(
+                n8n_command,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                **session
+            )
         except FileNotFoundError as e:
             self.log_and_print(f"❌ n8n no encontrado: {str(e)}", "error")
             self.log_and_print("💡 Intenta ejecutar: npm install -g n8n", "info")
@@ -668,32 +2675,241 @@ class N8NGuardian:
         except Exception as e:
             self.log_and_print(f"❌ Error inesperado iniciando n8n: {str(e)}", "error")
             return False
-    
-    def monitor_n8n(self):
-        """Monitorear n8n en segundo plano"""
-        self.log_and_print("👀 Monitoreo en segundo plano iniciado", "info")
         
-        while self.monitoring and self.n8n_process:
+        if isolated:
+            try:
+                self.isolation.apply(self.n8n_process.pid)
+            except OSError as e:
+                ProcessIsolation.release(self.n8n_process, start=False)
+                await self.n8n_process.wait()
+                self.log_and_print(f"❌ No se pudo aplicar el aislamiento a n8n: {e.strerror or e}", "error")
+                self.log_and_print("💡 Revisa la sección 'isolation' de la configuración "
+                                   "(nice negativo o cgroup sin permisos requieren root)", "info")
+                return False
+            ProcessIsolation.release(self.n8n_process)
+        
+        # Vaciar las tuberías continuamente: si se llenan, n8n se bloquea al escribir
+        self._stderr_tail = deque(maxlen=50)
+        self._pumps = [
+            asyncio.ensure_future(self._pump_output(self.n8n_process.stdout, "stdout")),
+            asyncio.ensure_future(self._pump_output(self.n8n_process.stderr, "stderr")),
+        ]
+        
+        # Despertar en cuanto n8n responda o termine, sin esperas fijas
+        self.log_and_print("⏳ Esperando que n8n se inicie...", "info")
+        grace = self.config.get("startup_grace_s", 8)
+        exited = asyncio.ensure_future(self.n8n_process.wait())
+        healthy = asyncio.ensure_future(self._wait_until_healthy())
+        done, _ = await asyncio.wait({exited, healthy}, timeout=grace, return_when=asyncio.FIRST_COMPLETED)
+        healthy.cancel()
+        
+        if exited in done:
+            self.log_and_print(f"❌ n8n se cerró inesperadamente durante el inicio (código {exited.result()})", "error")
+            await asyncio.wait(self._pumps, timeout=2)
+            if self._stderr_tail:
+                self.log_and_print("❌ Error de n8n: " + "\n".join(self._stderr_tail), "error")
+            self.alerts.emit("n8n_start_failed", "critical",
+                             f"n8n se cerró durante el inicio (código {exited.result()})",
+                             stderr_tail=list(self._stderr_tail)[-10:])
+            return False
+        exited.cancel()
+        
+        self.log_and_print("✅ n8n iniciado exitosamente", "success")
+        self.log_and_print(f"🌐 Acceso: {self.n8n_url}", "info")
+        if healthy in done:
+            self.log_and_print("✅ n8n responde a las sondas HTTP", "success")
+        else:
+            self.log_and_print("✅ n8n funcionando establemente", "success")
+        self.log_and_print(f"📄 Salida de n8n en: {self.n8n_output_log}", "info")
+        self.started_at = time.time()
+        return True
+    
+    async def _wait_until_healthy(self):
+        """Sondear el endpoint de salud hasta que n8n conteste"""
+        url = self.n8n_url + self.config.get("health_path", "/healthz")
+        while True:
             try:
-                # Verificar que el proceso siga activo
-                if self.n8n_process.poll() is not None:
-                    self.log_and_print("⚠️ n8n se detuvo inesperadamente", "warning")
+                status, _, _, _ = await http_request(url, timeout=2)
+                if status < 500:
+                    return True
+            except Exception:
+                pass
+            await asyncio.sleep(0.5)
+    
+    async def _pump_output(self, stream, name):
+        """Copiar stdout/stderr de n8n al log de salida línea a línea"""
+        with open(self.n8n_output_log, 'a', encoding='utf-8', buffering=1) as f:
+            while True:
+                try:
+                    line = await stream.readline()
+                except ValueError:
+                    line = await stream.read(65536)  # Línea más larga que el límite del buffer
+                if not line:
                     break
-                
-                # Log de estado cada 5 minutos
-                current_time = datetime.now()
-                if current_time.second == 0 and current_time.minute % 5 == 0:
-                    self.log_and_print("💓 n8n funcionando correctamente", "info")
-                
-                time.sleep(30)  # Verificar cada 30 segundos
-                
+                text = line.decode('utf-8', errors='replace').rstrip()
+                if name == "stderr":
+                    self._stderr_tail.append(text)
+                f.write(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} [{name}] {text}\n")
+    
+    async def _watch_process(self):
+        """Esperar la salida de n8n (evento, sin sondeo) y reiniciarlo si procede"""
+        while True:
+            returncode = await self.n8n_process.wait()
+            if not self.monitoring:
+                return
+            
+            self.log_and_print(f"⚠️ n8n se detuvo inesperadamente (código {returncode})", "warning")
+            self.alerts.emit("n8n_crash", "critical", f"n8n se detuvo inesperadamente (código {returncode})",
+                             returncode=returncode, restarts=self.restart_count,
+                             stderr_tail=list(self._stderr_tail)[-10:])
+            restart = self.config.get("restart_on_crash") and (self.daemon or self.config.get("auto_restart"))
+            if not restart and self.daemon:
+                self.monitoring = False
+                self._stop_event.set()
+                return
+            if not restart:
+                # Modo interactivo: la consola sigue disponible y el reinicio lo decide el usuario
+                self.log_and_print("💡 Escribe 'start' para iniciar n8n de nuevo o 'stop' para salir", "info")
+                self._relaunched.clear()
+                await self._relaunched.wait()
+                continue
+            
+            # Reinicio con espera exponencial; una parada solicitada la interrumpe
+            backoff_max = self.config.get("restart_backoff_max", 300)
+            if self.started_at and time.time() - self.started_at > backoff_max:
+                self.restart_count = 0  # Llevaba tiempo estable: volver a la espera mínima
+            delay = min(2 ** self.restart_count, backoff_max)
+            self.restart_count += 1
+            self.log_and_print(f"🔄 Reiniciando n8n en {delay}s (intento {self.restart_count})...", "warning")
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), delay)
+                return
+            except asyncio.TimeoutError:
+                pass
+            await self.launch_n8n()
+    
+    async def _probe_health(self):
+        """Sonda HTTP periódica contra n8n"""
+        url = self.n8n_url + self.config.get("health_path", "/healthz")
+        interval = self.config.get("probe_interval_s", 30)
+        threshold = self.config.get("probe_failure_threshold", 3)
+        failures = 0
+        while True:
+            await asyncio.sleep(interval)
+            if not self.is_n8n_running():
+                continue
+            latency = None
+            try:
+                with TRACER.span("probe_health", track="monitor: sonda HTTP"):
+                    status, _, _, latency = await http_request(url, timeout=5)
+                healthy = status < 500
+                detail = f"HTTP {status}"
             except Exception as e:
-                self.log_and_print(f"⚠️ Error en monitoreo: {str(e)}", "warning")
-                break
-        
-        self.log_and_print("👀 Monitoreo detenido", "info")
+                healthy = False
+                detail = type(e).__name__
+            self.last_probe = {
+                "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                "healthy": healthy,
+                "detail": detail,
+                "latency_ms": round(latency * 1000, 1) if latency is not None else None,
+            }
+            
+            if healthy:
+                if failures >= threshold:
+                    self.log_and_print(f"✅ n8n vuelve a responder en {url}", "success")
+                    self.alerts.emit("health_recovered", "info", f"n8n vuelve a responder en {url}", url=url)
+                failures = 0
+            else:
+                failures += 1
+                if failures == threshold:
+                    self.log_and_print(f"⚠️ n8n no responde en {url} ({detail}, {failures} sondas seguidas)", "warning")
+                    self.alerts.emit("health_failed", "warning", f"n8n no responde en {url} ({detail})",
+                                     url=url, detail=detail, failures=failures)
+    
+    async def _sample_resources(self):
+        """Muestreo periódico de CPU/RSS del árbol de procesos de n8n desde /proc"""
+        interval = self.config.get("sample_interval_s", 10)
+        previous = None
+        while True:
+            if self.is_n8n_running():
+                with TRACER.span("sample_resources", track="monitor: muestreo /proc"):
+                    usage = read_process_tree_usage(self.n8n_process.pid)
+                now = time.monotonic()
+                if usage:
+                    cpu_seconds, rss_bytes, procs = usage
+                    if previous and previous[2] == self.n8n_process.pid:
+                        self.last_sample = {
+                            "cpu_percent": round(100.0 * (cpu_seconds - previous[1]) / max(now - previous[0], 1e-9), 1),
+                            "rss_mb": round(rss_bytes / 1024 / 1024, 1),
+                            "processes": procs,
+                        }
+                        self.samples_taken += 1
+                    previous = (now, cpu_seconds, self.n8n_process.pid)
+            await asyncio.sleep(interval)
+    
+    async def _heartbeat(self):
+        """Registrar un latido periódico mientras n8n esté vivo"""
+        interval = self.config.get("heartbeat_interval_s", 300)
+        while True:
+            await asyncio.sleep(interval)
+            if self.is_n8n_running():
+                self.log_and_print("💓 n8n funcionando correctamente", "info")
     
-    def interactive_session(self):
+    async def _terminate_n8n(self):
+        """Terminar el proceso n8n y esperar a que cierre"""
+        process = self.n8n_process
+        if process is None or process.returncode is not None:
+            return
+        try:
+            self._signal_n8n(signal.SIGTERM)
+            await asyncio.wait_for(process.wait(), 10)
+            self.log_and_print("✅ n8n detenido exitosamente", "success")
+        except asyncio.TimeoutError:
+            self._signal_n8n(signal.SIGKILL if os.name == 'posix' else signal.SIGTERM, force=True)
+            await process.wait()
+            self.log_and_print("⚠️ n8n forzado a detenerse", "warning")
+        except ProcessLookupError:
+            pass
+        except Exception as e:
+            self.log_and_print(f"❌ Error deteniendo n8n: {str(e)}", "error")
+        if self._pumps:
+            await asyncio.wait(self._pumps, timeout=2)
+    
+    def _signal_n8n(self, sig, force=False):
+        """Enviar una señal a todo el árbol de n8n (el shell y sus hijos)"""
+        if os.name == 'posix':
+            os.killpg(self.n8n_process.pid, sig)
+        elif force:
+            self.n8n_process.kill()
+        else:
+            self.n8n_process.terminate()
+    
+    def _console_reader(self):
+        """Hilo único que atiende input() para la sesión interactiva"""
+        while True:
+            prompt, future = self._console_requests.get()
+            try:
+                line = input(prompt)
+                self._loop.call_soon_threadsafe(_resolve_future, future, line, None)
+            except BaseException as e:
+                loop = self._loop
+                if loop is None:
+                    return
+                loop.call_soon_threadsafe(_resolve_future, future, None, e)
+                if isinstance(e, EOFError):
+                    return
+    
+    async def read_console_line(self, prompt):
+        """input() sin bloquear el bucle de eventos"""
+        if self._console_thread is None or not self._console_thread.is_alive():
+            self._console_requests = queue.Queue()
+            self._console_thread = threading.Thread(target=self._console_reader, daemon=True)
+            self._console_thread.start()
+        future = self._loop.create_future()
+        self._console_requests.put((prompt, future))
+        return await future
+    
+    async def interactive_session(self):
         """Sesión interactiva mientras n8n está ejecutándose"""
         print(f"\n{Colors.HEADER}{'='*50}")
         print(f"🎮 SESIÓN INTERACTIVA - N8N GUARDIAN")
@@ -707,66 +2923,115 @@ class N8NGuardian:
         print(f"{Colors.BOLD}  debug     {Colors.NORMAL}- Debug de npm audit (ver salida raw)")
         print(f"{Colors.BOLD}  n8ndebug  {Colors.NORMAL}- Debug de n8n executable")
         print(f"{Colors.BOLD}  open      {Colors.NORMAL}- Abrir n8n en el navegador")
+        print(f"{Colors.BOLD}  loadtest  {Colors.NORMAL}- Prueba de carga: loadtest [url] [req/s] [segundos]")
+        print(f"{Colors.BOLD}  db        {Colors.NORMAL}- Tamaño y crecimiento de la base de ejecuciones")
+        print(f"{Colors.BOLD}  dbprune   {Colors.NORMAL}- Podar ejecuciones antiguas: dbprune [días] [segundos]")
+        print(f"{Colors.BOLD}  backup    {Colors.NORMAL}- Crear backup incremental de la carpeta de datos")
+        print(f"{Colors.BOLD}  backups   {Colors.NORMAL}- Listar backups disponibles")
+        print(f"{Colors.BOLD}  start     {Colors.NORMAL}- Iniciar n8n de nuevo si se ha detenido")
         print(f"{Colors.BOLD}  stop      {Colors.NORMAL}- Detener n8n y guardian")
         print(f"{Colors.BOLD}  help      {Colors.NORMAL}- Mostrar esta ayuda")
         
-        while self.monitoring:
-            try:
-                command = input(f"\n{Colors.BOLD}Guardian> {Colors.NORMAL}").strip().lower()
+        try:
+            while self.monitoring:
+                try:
+                    raw_command = (await self.read_console_line(f"\n{Colors.BOLD}Guardian> {Colors.NORMAL}")).strip()
+                except KeyboardInterrupt:
+                    print(f"\n{Colors.WARNING}Ctrl+C detectado. Deteniendo...{Colors.NORMAL}")
+                    break
+                except EOFError:
+                    break
+                
+                args = raw_command.split()
+                command = args.pop(0).lower() if args else ""
                 
                 if command == "status":
-                    if self.n8n_process and self.n8n_process.poll() is None:
+                    if self.is_n8n_running():
                         self.log_and_print("✅ n8n está ejecutándose correctamente", "success")
-                        self.log_and_print("🌐 URL: http://localhost:5678", "info")
+                        self.log_and_print(f"🌐 URL: {self.n8n_url}", "info")
+                        if self.last_sample:
+                            print(f"{Colors.INFO}📊 CPU: {self.last_sample['cpu_percent']}% | RSS: {self.last_sample['rss_mb']} MB{Colors.NORMAL}")
+                        if self.last_probe:
+                            print(f"{Colors.INFO}🩺 Última sonda: {self.last_probe['detail']} ({self.last_probe['latency_ms']} ms){Colors.NORMAL}")
+                        if self.isolation.active:
+                            limits = self.isolation.describe(self.n8n_process.pid)
+                            print(f"{Colors.INFO}🧱 Límites: " + ", ".join(f"{k}={v}" for k, v in limits.items()) + Colors.NORMAL)
                     else:
                         self.log_and_print("❌ n8n no está ejecutándose", "error")
                 
                 elif command == "logs":
-                    self.show_recent_logs()
+                    await self.run_blocking(self.show_recent_logs)
                 
                 elif command == "security":
-                    self.show_security_logs()
+                    await self.run_blocking(self.show_security_logs)
                 
                 elif command == "audit":
-                    self.security_audit()
+                    async with self._audit_lock:
+                        await self.run_blocking(self.security_audit)
                 
                 elif command == "debug":
-                    self.debug_npm_audit()
+                    await self.run_blocking(self.debug_npm_audit)
                 
                 elif command == "n8ndebug":
-                    self.debug_n8n_executable()
+                    await self.run_blocking(self.debug_n8n_executable)
                 
                 elif command == "open":
-                    webbrowser.open('http://localhost:5678')
+                    await self.run_foreground(webbrowser.open, self.n8n_url)
                     self.log_and_print("🌐 n8n abierto en el navegador", "info")
                 
+                elif command == "loadtest":
+                    try:
+                        url = args[0] if args else None
+                        rate = float(args[1]) if len(args) > 1 else 10.0
+                        duration = float(args[2]) if len(args) > 2 else 10.0
+                    except ValueError:
+                        print(f"{Colors.WARNING}Uso: loadtest [url] [req/s] [segundos]{Colors.NORMAL}")
+                        continue
+                    await self.run_loadtest_async(url, rate=rate, duration=duration)
+                
+                elif command == "db":
+                    await self.run_blocking(self.show_database_stats)
+                
+                elif command == "dbprune":
+                    try:
+                        days = float(args[0]) if args else None
+                        budget = float(args[1]) if len(args) > 1 else None
+                    except ValueError:
+                        print(f"{Colors.WARNING}Uso: dbprune [días] [segundos]{Colors.NORMAL}")
+                        continue
+                    await self.run_foreground(self.prune_database, days, budget)
+                
+                elif command == "backup":
+                    await self.run_blocking(self.create_backup)
+                
+                elif command == "backups":
+                    await self.run_blocking(self.list_backups)
+                
+                elif command == "start":
+                    if self.is_n8n_running():
+                        self.log_and_print("ℹ️ n8n ya está ejecutándose", "info")
+                    elif await self.launch_n8n():
+                        self._relaunched.set()
+                
                 elif command == "stop":
-                    self.stop_n8n()
                     break
                 
                 elif command == "help":
-                    print(f"{Colors.INFO}Comandos: status, logs, security, audit, debug, n8ndebug, open, stop, help{Colors.NORMAL}")
+                    print(f"{Colors.INFO}Comandos: status, logs, security, audit, debug, n8ndebug, open, loadtest, db, dbprune, backup, backups, start, stop, help{Colors.NORMAL}")
                 
                 elif command == "":
                     continue
                     
                 else:
                     print(f"{Colors.WARNING}Comando no reconocido. Escribe 'help' para ver comandos disponibles{Colors.NORMAL}")
-                    
-            except KeyboardInterrupt:
-                print(f"\n{Colors.WARNING}Ctrl+C detectado. Deteniendo...{Colors.NORMAL}")
-                self.stop_n8n()
-                break
-            except EOFError:
+        finally:
+            if self.monitoring:
                 self.stop_n8n()
-                break
     
     def show_recent_logs(self):
         """Mostrar últimos logs principales"""
         try:
-            with open(self.log_file, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-                recent_lines = lines[-10:]  # Últimas 10 líneas
+            recent_lines = tail_lines(self.log_file, 10)  # Últimas 10 líneas
                 
             print(f"\n{Colors.INFO}📝 Últimos logs principales:{Colors.NORMAL}")
             for line in recent_lines:
@@ -895,43 +3160,532 @@ class N8NGuardian:
         print(f"  PATH actual contiene 'nodejs': {'nodejs' in os.environ.get('PATH', '').lower()}")
         print(f"  Ruta npm actual usada: {self.npm_path}")
         print(f"  Ruta n8n actual usada: {self.n8n_path}")
-    
+
+    def collect_database_stats(self):
+        """Tomar una muestra de la base de ejecuciones y calcular su crecimiento"""
+        if not self.execution_db.exists():
+            return None
+        stats = ExecutionDatabase(self.execution_db).stats()
+
+        # El historial en JSONL permite calcular la tasa de crecimiento entre reinicios
+        previous = None
+        if self.db_stats_file.exists():
+            last_lines = tail_lines(self.db_stats_file, 1)
+            if last_lines:
+                try:
+                    previous = json.loads(last_lines[0])
+                except ValueError:
+                    previous = None
+        if previous and previous.get("path") == stats["path"]:
+            stats["growth"] = ExecutionDatabase.growth(previous, stats)
+        with open(self.db_stats_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({k: v for k, v in stats.items() if k != "growth"}) + "\n")
+
+        self.last_db_stats = stats
+        return stats
+
+    def show_database_stats(self):
+        """Mostrar tamaño y crecimiento de la base de ejecuciones de n8n"""
+        try:
+            stats = self.collect_database_stats()
+        except Exception as e:
+            self.log_and_print(f"❌ Error leyendo la base de ejecuciones: {str(e)}", "error")
+            return None
+        if stats is None:
+            self.log_and_print(f"⚠️ No se encontró la base de ejecuciones en {self.execution_db}", "warning")
+            return None
+
+        mb = lambda value: round(value / 1024 / 1024, 1)
+        print(f"\n{Colors.INFO}🗄️  Base de ejecuciones: {stats['path']}{Colors.NORMAL}")
+        print(f"  Tamaño: {mb(stats['file_bytes'])} MB | WAL: {mb(stats['wal_bytes'])} MB | Libre: {mb(stats['freelist_bytes'])} MB")
+        if stats["executions"] is not None:
+            print(f"  Ejecuciones: {stats['executions']} (la más antigua: {stats['oldest_execution'] or '-'})")
+        growth = stats.get("growth")
+        if growth:
+            print(f"  Crecimiento: {mb(growth['bytes_per_hour'])} MB/h, {growth['executions_per_hour']} ejecuciones/h")
+        return stats
+
+    def prune_database(self, older_than_days=None, time_budget_s=None, batch_size=None):
+        """Poda incremental de ejecuciones antiguas sin bloquear a n8n"""
+        settings = self.config["db_prune"]
+        older_than_days = settings["older_than_days"] if older_than_days is None else older_than_days
+        time_budget_s = settings["time_budget_s"] if time_budget_s is None else time_budget_s
+        batch_size = settings["batch_size"] if batch_size is None else batch_size
+
+        if not self.execution_db.exists():
+            self.log_and_print(f"⚠️ No se encontró la base de ejecuciones en {self.execution_db}", "warning")
+            return None
+        # Una sola poda a la vez, venga de la consola, del socket o de la tarea automática
+        if not self._prune_lock.acquire(blocking=False):
+            self.log_and_print("⏳ Ya hay una poda de la base en curso", "warning")
+            return None
+
+        self.log_and_print(f"🧹 Podando ejecuciones de más de {older_than_days} días "
+                           f"(lotes de {batch_size}, máximo {time_budget_s}s)...", "info")
+        try:
+            result = ExecutionDatabase(self.execution_db).prune(
+                older_than_days, batch_size=batch_size, time_budget_s=time_budget_s,
+                pause_s=settings["pause_s"])
+        except Exception as e:
+            self.log_and_print(f"❌ Error podando la base de ejecuciones: {str(e)}", "error")
+            return None
+        finally:
+            self._prune_lock.release()
+
+        pending = "" if result["complete"] else " (quedan ejecuciones: presupuesto agotado)"
+        self.log_and_print(f"✅ {result['deleted']} ejecuciones eliminadas en {result['batches']} lotes, "
+                           f"{result['elapsed_s']}s, lote más lento {result['max_batch_ms']} ms{pending}", "success")
+        return result
+
+    async def _monitor_database(self):
+        """Muestreo periódico de la base de ejecuciones y poda automática opcional"""
+        interval = self.config.get("db_sample_interval_s", 600)
+        warning_bytes = self.config.get("db_size_warning_mb", 1024) * 1024 * 1024
+        settings = self.config["db_prune"]
+        last_prune = time.monotonic()
+        warned = False
+        while True:
+            try:
+                with TRACER.span("collect_database_stats", track="monitor: base de ejecuciones"):
+                    stats = await self.run_blocking(self.collect_database_stats)
+            except Exception as e:
+                self.logger.warning(f"No se pudo muestrear la base de ejecuciones: {e}")
+                stats = None
+
+            if stats:
+                size = stats["file_bytes"] + stats["wal_bytes"]
+                if size >= warning_bytes and not warned:
+                    self.log_and_print(f"⚠️ La base de ejecuciones ocupa {round(size / 1024 / 1024)} MB "
+                                       f"(umbral {self.config.get('db_size_warning_mb')} MB)", "warning")
+                    self.alerts.emit("db_size", "warning", f"La base de ejecuciones ocupa {round(size / 1024 / 1024)} MB",
+                                     path=stats["path"], bytes=size, executions=stats["executions"])
+                warned = size >= warning_bytes
+
+                if settings.get("enabled") and time.monotonic() - last_prune >= settings.get("interval_s", 3600):
+                    last_prune = time.monotonic()
+                    await self.run_foreground(self.prune_database)
+
+            await asyncio.sleep(interval)
+
+    @traced()
+    def create_backup(self, reason="manual"):
+        """Snapshot incremental de la carpeta de datos de n8n (workflows, credenciales, base)"""
+        if not self.n8n_data_dir.exists():
+            self.log_and_print(f"⚠️ No existe la carpeta de datos de n8n: {self.n8n_data_dir}", "warning")
+            return None
+        if not self._backup_lock.acquire(blocking=False):
+            self.log_and_print("⏳ Ya hay un backup en curso", "warning")
+            return None
+
+        self.log_and_print(f"💾 Creando backup de {self.n8n_data_dir} ({reason})...", "info")
+        try:
+            manifest = self.backup_store.create(self.n8n_data_dir, reason=reason, exclude=[self.guardian_dir])
+            removed, freed = self.backup_store.prune(self.config.get("backup_keep", 10))
+        except Exception as e:
+            self.log_and_print(f"❌ Error creando backup: {str(e)}", "error")
+            self.alerts.emit("backup_failed", "critical", f"Error creando backup ({reason}): {e}", reason=reason)
+            return None
+        finally:
+            self._backup_lock.release()
+
+        stats = manifest["stats"]
+        self.log_and_print(f"✅ Backup {manifest['id']}: {stats['files']} archivos, "
+                           f"{stats['rehashed_files']} releídos, {round(stats['new_bytes'] / 1024 / 1024, 1)} MB nuevos "
+                           f"en {stats['elapsed_s']}s", "success")
+        if removed:
+            self.log_and_print(f"🧹 {removed} backups antiguos eliminados ({round(freed / 1024 / 1024, 1)} MB liberados)", "info")
+        return {key: manifest[key] for key in ("id", "created", "reason", "source", "stats")}
+
+    def backup_before_change(self, action):
+        """Backup previo a una actualización o reinstalación; sin backup, se pregunta"""
+        if not self.n8n_data_dir.exists() or self.create_backup(action):
+            return True
+        return self.ask_yes_no(f"⚠️ No se pudo crear el backup. ¿Continuar con la {action} igualmente?",
+                               "continue_without_backup")
+
+    def list_backups(self):
+        """Mostrar los snapshots disponibles"""
+        try:
+            backups = self.backup_store.list()
+        except Exception as e:
+            self.log_and_print(f"❌ Error leyendo backups: {str(e)}", "error")
+            return []
+        if not backups:
+            self.log_and_print("ℹ️ No hay backups todavía", "info")
+            return []
+
+        print(f"\n{Colors.INFO}💾 Backups en {self.backup_store.root}:{Colors.NORMAL}")
+        for backup in backups:
+            stats = backup["stats"]
+            print(f"  {backup['id']}  {backup['created']}  {backup['reason']:<14} "
+                  f"{stats['files']} archivos, {round(stats['bytes'] / 1024 / 1024, 1)} MB "
+                  f"(+{round(stats['new_bytes'] / 1024 / 1024, 1)} MB nuevos)")
+        return backups
+
+    def restore_backup(self, snapshot_id, target=None):
+        """Restaurar un snapshot; sin destino, sustituye la carpeta de datos de n8n"""
+        if target is None and self.is_n8n_running():
+            self.log_and_print("❌ Detén n8n antes de restaurar sobre su carpeta de datos", "error")
+            return None
+
+        destination = Path(target) if target else self.n8n_data_dir
+        if target is not None and destination.exists() and any(destination.iterdir()):
+            self.log_and_print(f"❌ El destino {destination} no está vacío", "error")
+            return None
+
+        # Se restaura al lado y solo se cambia de sitio cuando todos los bloques están verificados
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        staging = destination.with_name(f"{destination.name}.restoring-{stamp}")
+        aside = None
+        try:
+            manifest = self.backup_store.restore(snapshot_id, staging)
+            if target is None and destination.exists():
+                # La carpeta actual se aparta, no se borra
+                aside = destination.with_name(f"{destination.name}.pre-restore-{stamp}")
+                destination.rename(aside)
+            elif destination.exists():
+                destination.rmdir()  # Destino explícito vacío
+            staging.rename(destination)
+        except Exception as e:
+            self.log_and_print(f"❌ Error restaurando el backup {snapshot_id}: {str(e)}", "error")
+            import shutil
+            shutil.rmtree(staging, ignore_errors=True)
+            if aside is not None:
+                try:
+                    aside.rename(destination)
+                except OSError as rename_error:
+                    self.log_and_print(f"⚠️ No se pudo devolver la carpeta de datos a su sitio ({rename_error}); "
+                                       f"tus datos siguen en {aside}", "error")
+                    return None
+            self.log_and_print(f"📁 La carpeta de datos {destination} no se ha modificado", "info")
+            return None
+
+        self.log_and_print(f"✅ Backup {snapshot_id} restaurado en {destination}", "success")
+        if aside is not None:
+            self.log_and_print(f"📁 Datos anteriores conservados en {aside}", "info")
+        return {"id": manifest["id"], "target": str(destination), "previous": str(aside) if aside else None}
+
+    def run_loadtest(self, url=None, rate=10.0, duration=10.0, connections=10, payload=None, sample_pid=None):
+        """Prueba de carga contra un webhook de n8n con muestreo de CPU/RSS"""
+        return asyncio.run(self.run_loadtest_async(url, rate, duration, connections, payload, sample_pid))
+
+    async def run_loadtest_async(self, url=None, rate=10.0, duration=10.0, connections=10, payload=None, sample_pid=None):
+        """Versión asíncrona de run_loadtest para usar dentro del bucle de supervisión"""
+        url = url or f"{self.n8n_url}/webhook/loadtest"
+        if sample_pid is None and self.is_n8n_running():
+            sample_pid = self.n8n_process.pid
+
+        self.log_and_print(f"📈 Prueba de carga: {url} ({rate} req/s durante {duration}s, {connections} conexiones)", "info")
+        if not sample_pid:
+            self.log_and_print("⚠️ Sin proceso n8n supervisado: no se muestrearán CPU/RSS", "warning")
+
+        try:
+            tester = WebhookLoadTester(url, rate=rate, duration=duration, connections=connections,
+                                       payload=payload, sample_pid=sample_pid)
+            report = await tester.run()
+        except Exception as e:
+            self.log_and_print(f"❌ Error en la prueba de carga: {str(e)}", "error")
+            return None
+
+        self.print_loadtest_report(report)
+
+        # Guardar el reporte completo para comparar entre ejecuciones
+        try:
+            report_dir = self.guardian_dir / "loadtests"
+            report_dir.mkdir(exist_ok=True)
+            report_file = report_dir / f"loadtest_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+            with open(report_file, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+            self.log_and_print(f"📄 Reporte guardado en: {report_file}", "info")
+        except Exception as e:
+            self.log_and_print(f"⚠️ No se pudo guardar el reporte: {str(e)}", "warning")
+
+        return report
+
+    def print_loadtest_report(self, report):
+        """Mostrar resumen de una prueba de carga"""
+        latency = report["latency_ms"]
+        print(f"\n{Colors.HEADER}📊 RESULTADO DE LA PRUEBA DE CARGA{Colors.NORMAL}")
+        print(f"  Peticiones: {report['requests']} ({report['successful']} OK, {report['errors']} errores)")
+        print(f"  Throughput: {report['throughput_rps']} req/s (objetivo {report['target_rate']} req/s)")
+        print(f"  Latencia (ms): p50={latency['p50']} p90={latency['p90']} p99={latency['p99']} max={latency['max']}")
+
+        color = Colors.SUCCESS if report["error_rate"] == 0 else Colors.WARNING
+        print(f"{color}  Tasa de error: {report['error_rate'] * 100:.2f}%{Colors.NORMAL}")
+        for kind, count in report["error_kinds"].items():
+            print(f"    • {kind}: {count}")
+
+        resources = report.get("n8n_resources")
+        if resources:
+            print(f"  n8n CPU: media {resources['cpu_percent_avg']}% / máx {resources['cpu_percent_max']}%")
+            print(f"  n8n RSS: media {resources['rss_mb_avg']} MB / máx {resources['rss_mb_max']} MB")
+
+            print(f"\n{Colors.INFO}  {'seg':>4} {'req':>6} {'err':>5} {'p50 ms':>9} {'CPU %':>7} {'RSS MB':>8}{Colors.NORMAL}")
+            for row in report["timeline"]:
+                print(f"  {row['t']:>4} {row['requests']:>6} {row['errors']:>5} "
+                      f"{str(row['p50_ms']):>9} {str(row.get('cpu_percent', '-')):>7} {str(row.get('rss_mb', '-')):>8}")
+
+        self.logger.info(
+            f"Loadtest {report['url']}: {report['throughput_rps']} req/s, "
+            f"p50={latency['p50']}ms p99={latency['p99']}ms, error_rate={report['error_rate']}"
+        )
+
+    def run_fleet(self, inventory_path, checks=None, parallel=None, json_output=None):
+        """Modo flota: chequeos concurrentes sobre todas las instancias de un inventario"""
+        try:
+            with open(inventory_path, 'r', encoding='utf-8') as f:
+                inventory = json.load(f)
+            instances = inventory["instances"]
+            for instance in instances:
+                if "url" not in instance:
+                    raise ValueError(f"instancia sin 'url': {instance}")
+        except Exception as e:
+            self.log_and_print(f"❌ Inventario inválido ({inventory_path}): {str(e)}", "error")
+            return None
+
+        defaults = inventory.get("defaults", {})
+        checks = checks or defaults.get("checks") or list(FleetChecker.CHECKS)
+        unknown = [check for check in checks if check not in FleetChecker.CHECKS]
+        if unknown:
+            self.log_and_print(f"❌ Chequeos desconocidos: {', '.join(unknown)}", "error")
+            return None
+        parallel = parallel or defaults.get("parallel", 8)
+        self.log_and_print(f"🛰️ Flota: {len(instances)} instancias, chequeos {', '.join(checks)}, paralelismo {parallel}", "info")
+
+        # La última versión publicada es la misma para todas: consultarla una sola vez
+        latest_version = self.get_latest_n8n_version() if "version" in checks else None
+
+        checker = FleetChecker(
+            instances,
+            checks=checks,
+            parallel=parallel,
+            timeout=defaults.get("timeout_s", 60),
+            health_path=defaults.get("health_path", self.config.get("health_path", "/healthz")),
+            latest_version=latest_version,
+            compare_versions=self.compare_versions,
+        )
+        try:
+            report = asyncio.run(checker.run())
+        except Exception as e:
+            self.log_and_print(f"❌ Error en el modo flota: {str(e)}", "error")
+            return None
+
+        self.print_fleet_report(report)
+
+        try:
+            report_dir = self.guardian_dir / "fleet"
+            report_dir.mkdir(exist_ok=True)
+            report_file = Path(json_output) if json_output else report_dir / f"fleet_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+            with open(report_file, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+            self.log_and_print(f"📄 Reporte de flota guardado en: {report_file}", "info")
+        except Exception as e:
+            self.log_and_print(f"⚠️ No se pudo guardar el reporte: {str(e)}", "warning")
+
+        return report
+
+    def print_fleet_report(self, report):
+        """Mostrar la tabla resumen y las métricas agregadas de la flota"""
+        print(f"\n{Colors.HEADER}🛰️ RESUMEN DE LA FLOTA{Colors.NORMAL}")
+        header = f"  {'Instancia':<20} {'Salud':<7} {'ms':>7} {'node':<9} {'npm':<8} {'n8n':<9} {'C/H/M/L':<13} Errores"
+        print(f"{Colors.BOLD}{header}{Colors.NORMAL}")
+
+        for result in report["instances"]:
+            health = result.get("health") or {}
+            preflight = result.get("preflight") or {}
+            version = result.get("version") or {}
+            audit = result.get("audit")
+
+            health_text = "-" if not health else ("OK" if health["healthy"] else "FALLO")
+            latency = health.get("latency_ms")
+            n8n_text = version.get("installed") or "-"
+            if version.get("outdated"):
+                n8n_text += "↑"
+            audit_text = "/".join(str(audit[s]) for s in ("critical", "high", "moderate", "low")) if audit else "-"
+
+            if result["errors"] or health.get("healthy") is False or (audit and audit["critical"]):
+                color = Colors.ERROR
+            elif version.get("outdated") or (audit and audit["high"]):
+                color = Colors.WARNING
+            else:
+                color = Colors.SUCCESS
+            print(f"{color}  {result['name'][:20]:<20} {health_text:<7} {str(latency if latency is not None else '-'):>7} "
+                  f"{str(preflight.get('node') or '-'):<9} {str(preflight.get('npm') or '-'):<8} {n8n_text:<9} "
+                  f"{audit_text:<13} {len(result['errors'])}{Colors.NORMAL}")
+            for error in result["errors"]:
+                print(f"      • {error}")
+
+        metrics = report["metrics"]
+        vulns = metrics["vulnerabilities"]
+        print(f"\n{Colors.INFO}📊 Métricas:{Colors.NORMAL}")
+        print(f"  Instancias: {metrics['instances']} | Sanas: {metrics['healthy']} | Con errores: {metrics['with_errors']}")
+        print(f"  Desactualizadas: {metrics['outdated']} (última: {report['instances'][0].get('version', {}).get('latest') if report['instances'] else '-'})")
+        print(f"  Vulnerables (críticas/altas): {metrics['vulnerable']} | Total C/H/M/L: "
+              f"{vulns['critical']}/{vulns['high']}/{vulns['moderate']}/{vulns['low']}")
+        print(f"  Latencia de salud: p50={metrics['health_latency_ms']['p50']} ms, máx={metrics['health_latency_ms']['max']} ms")
+        print(f"  Duración total: {report['duration_s']}s (paralelismo {report['parallel']})")
+
+        self.logger.info(
+            f"Fleet: {metrics['instances']} instancias, {metrics['healthy']} sanas, "
+            f"{metrics['with_errors']} con errores, {metrics['outdated']} desactualizadas, {metrics['vulnerable']} vulnerables"
+        )
+
+    def flush_alerts(self):
+        """Enviar las alertas pendientes cuando no hay bucle de supervisión (comandos de una sola ejecución)"""
+        if self._loop is None and self.alerts.pending:
+            try:
+                asyncio.run(self.alerts.drain())
+            except Exception as e:
+                self.logger.warning(f"No se pudieron enviar las alertas pendientes: {e}")
+
     def stop_n8n(self):
-        """Detener n8n y el monitoreo"""
+        """Detener n8n y el monitoreo (se puede llamar desde cualquier hilo)"""
         self.log_and_print("🛑 Deteniendo n8n...", "warning")
         
         self.monitoring = False
         
-        if self.n8n_process:
+        # El bucle de supervisión termina el proceso al ver el evento de parada
+        loop = self._loop
+        if loop is not None and self._stop_event is not None:
+            loop.call_soon_threadsafe(self._stop_event.set)
+
+    def get_status(self):
+        """Estado actual de n8n como diccionario (para el socket de control)"""
+        running = self.is_n8n_running()
+        return {
+            "running": running,
+            "pid": self.n8n_process.pid if running else None,
+            "url": self.n8n_url,
+            "monitoring": self.monitoring,
+            "uptime_s": round(time.time() - self.started_at, 1) if running and self.started_at else None,
+            "restarts": self.restart_count,
+            "resources": self.last_sample,
+            "last_probe": self.last_probe,
+            "last_audit": self.last_audit,
+            "database": self.last_db_stats,
+            "alerts": dict(self.alerts.stats, sinks=len(self.alerts.sinks)),
+            "isolation": self.isolation.describe(self.n8n_process.pid) if running else None,
+        }
+
+    async def _control_server(self):
+        """Modo daemon: atender comandos por socket Unix dentro del bucle de supervisión"""
+        if not hasattr(socket, "AF_UNIX"):
+            self.log_and_print("❌ El socket de control requiere sockets Unix (no disponible en esta plataforma)", "error")
+            return
+
+        try:
+            # Un socket huérfano de una ejecución anterior impediría el bind
+            if self.control_socket.exists():
+                if await self.run_blocking(send_control_command, self.control_socket, "status", 1) is not None:
+                    raise RuntimeError(f"ya hay un guardian escuchando en {self.control_socket}")
+                self.control_socket.unlink()
+
+            server = await asyncio.start_unix_server(self._handle_control_client, path=str(self.control_socket))
+            os.chmod(self.control_socket, 0o600)
+        except Exception as e:
+            self.log_and_print(f"❌ Error en el socket de control: {str(e)}", "error")
+            return
+
+        self.log_and_print(f"🔌 Socket de control escuchando en: {self.control_socket}", "info")
+        try:
+            await self._stop_event.wait()
+        finally:
+            server.close()
             try:
-                self.n8n_process.terminate()
-                self.n8n_process.wait(timeout=10)
-                self.log_and_print("✅ n8n detenido exitosamente", "success")
-            except subprocess.TimeoutExpired:
-                self.n8n_process.kill()
-                self.log_and_print("⚠️ n8n forzado a detenerse", "warning")
-            except Exception as e:
-                self.log_and_print(f"❌ Error deteniendo n8n: {str(e)}", "error")
-    
+                self.control_socket.unlink()
+            except OSError:
+                pass
+            self.log_and_print("🔌 Socket de control cerrado", "info")
+
+    async def _handle_control_client(self, reader, writer):
+        try:
+            line = await asyncio.wait_for(reader.readline(), 10)
+            args = line.decode('utf-8', errors='replace').split()
+            command = args.pop(0).lower() if args else ""
+            response = await self._dispatch_control(command, args)
+        except Exception as e:
+            response = {"ok": False, "error": str(e)}
+
+        try:
+            writer.write((json.dumps(response, ensure_ascii=False) + "\n").encode('utf-8'))
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch_control(self, command, args):
+        """Ejecutar un comando de control; lo bloqueante va al pool para no frenar la supervisión"""
+        if command == "status":
+            result = self.get_status()
+
+        elif command == "logs":
+            count = int(args[0]) if args else 10
+            result = {"lines": await self.run_blocking(tail_lines, self.log_file, count)}
+
+        elif command == "security":
+            count = int(args[0]) if args else 50
+            lines = []
+            if self.security_log.exists():
+                lines = await self.run_blocking(tail_lines, self.security_log, count)
+            result = {"lines": lines}
+
+        elif command == "audit":
+            # Varios clientes pidiendo auditoría a la vez comparten una sola ejecución
+            if self._audit_lock.locked():
+                async with self._audit_lock:
+                    pass
+            else:
+                async with self._audit_lock:
+                    await self.run_blocking(self.security_audit)
+            result = self.last_audit
+
+        elif command == "db":
+            result = await self.run_blocking(self.collect_database_stats)
+
+        elif command == "dbprune":
+            days = float(args[0]) if args else None
+            budget = float(args[1]) if len(args) > 1 else None
+            result = await self.run_foreground(self.prune_database, days, budget)
+
+        elif command == "backup":
+            result = await self.run_blocking(self.create_backup)
+
+        elif command == "backups":
+            result = await self.run_blocking(self.backup_store.list)
+
+        elif command == "stop":
+            self.stop_n8n()
+            result = {"stopped": True}
+
+        elif command == "help":
+            result = {"commands": list(CONTROL_COMMANDS)}
+
+        else:
+            return {"ok": False, "error": f"Comando no reconocido: '{command}'. Usa 'help'"}
+
+        return {"ok": True, "command": command, "result": result}
+
+    @traced()
     def run(self):
-        """Función principal"""
+        """Función principal; devuelve False si n8n no llegó a arrancar o falló la supervisión"""
         try:
             self.print_header()
             
             # Verificar dependencias
             if not self.check_node_installed():
-                return
+                return False
             
             if not self.check_npm_installed():
-                return
+                return False
             
             # Verificar que n8n sea ejecutable directamente
             if not self.check_n8n_executable():
-                return
+                return False
             
             # Verificar y actualizar n8n
             if not self.check_and_update_n8n():
-                return
+                return False
             
             # Auditoría de seguridad
             self.security_audit()
@@ -940,22 +3694,18 @@ class N8NGuardian:
             print(f"\n{Colors.HEADER}🚀 LISTO PARA INICIAR N8N{Colors.NORMAL}")
             print(f"{Colors.INFO}Todas las verificaciones completadas.{Colors.NORMAL}")
             
-            while True:
-                choice = input(f"{Colors.BOLD}¿Iniciar n8n con monitoreo? (S/N): {Colors.NORMAL}").strip().lower()
-                if choice in ['s', 'sí', 'si', 'y', 'yes']:
-                    if self.start_n8n_monitoring():
-                        self.interactive_session()
-                    break
-                elif choice in ['n', 'no']:
-                    self.log_and_print("👋 Guardian terminado por decisión del usuario", "info")
-                    break
-                else:
-                    print(f"{Colors.ERROR}Por favor responde S o N{Colors.NORMAL}")
+            if self.ask_yes_no("¿Iniciar n8n con monitoreo?", "start_n8n", default=True):
+                return self.start_n8n_monitoring()
+            
+            self.log_and_print("👋 Guardian terminado por decisión del usuario", "info")
+            return True
         
         except KeyboardInterrupt:
             print(f"\n{Colors.WARNING}Interrumpido por el usuario{Colors.NORMAL}")
+            return True
         except Exception as e:
             self.log_and_print(f"❌ Error inesperado: {str(e)}", "error")
+            return False
         finally:
             if self.monitoring:
                 self.stop_n8n()
@@ -964,6 +3714,166 @@ class N8NGuardian:
             print(f"{Colors.INFO}📝 Logs guardados en: {self.log_file}{Colors.NORMAL}")
             print(f"{Colors.INFO}🔒 Auditorías de seguridad en: {self.security_log}{Colors.NORMAL}")
 
+def parse_args(argv=None):
+    """Argumentos de línea de comandos"""
+    parser = argparse.ArgumentParser(description="N8N Guardian - gestión y monitoreo de n8n")
+    subparsers = parser.add_subparsers(dest="command")
+
+    loadtest = subparsers.add_parser("loadtest", help="Prueba de carga contra un webhook de n8n")
+    loadtest.add_argument("url", nargs="?", help="URL del webhook (por defecto http://localhost:5678/webhook/loadtest)")
+    loadtest.add_argument("--rate", type=float, default=10.0, help="Peticiones por segundo (lazo abierto)")
+    loadtest.add_argument("--duration", type=float, default=10.0, help="Duración en segundos")
+    loadtest.add_argument("--connections", type=int, default=10, help="Tamaño del pool de conexiones")
+    loadtest.add_argument("--payload", help="Cuerpo JSON a enviar")
+    loadtest.add_argument("--pid", type=int, help="PID de n8n para muestrear CPU/RSS")
+
+    fleet = subparsers.add_parser("fleet", help="Chequeos concurrentes sobre un inventario de instancias n8n")
+    fleet.add_argument("--inventory", "-i", required=True, help="Archivo JSON de inventario")
+    fleet.add_argument("--checks", help=f"Lista separada por comas ({','.join(FleetChecker.CHECKS)})")
+    fleet.add_argument("--parallel", type=int, help="Máximo de instancias chequeadas a la vez")
+    fleet.add_argument("--json", dest="json_output", help="Guardar el reporte JSON en esta ruta")
+
+    subparsers.add_parser("db", help="Tamaño y crecimiento de la base de ejecuciones de n8n")
+
+    db_prune = subparsers.add_parser("db-prune", help="Podar ejecuciones antiguas en lotes pequeños")
+    db_prune.add_argument("--older-than-days", type=float, help="Antigüedad mínima de las ejecuciones a borrar")
+    db_prune.add_argument("--batch-size", type=int, help="Ejecuciones por transacción")
+    db_prune.add_argument("--time-budget", type=float, help="Segundos máximos de poda")
+
+    backup = subparsers.add_parser("backup", help="Backups incrementales de la carpeta de datos de n8n")
+    backup.add_argument("action", nargs="?", choices=("create", "list", "restore"), default="create")
+    backup.add_argument("snapshot", nargs="?", help="Id del backup a restaurar")
+    backup.add_argument("--target", help="Restaurar en esta carpeta en lugar de la de n8n")
+
+    packages = subparsers.add_parser("packages", help="Caché local de versiones de n8n (instalar, volver atrás)")
+    packages.add_argument("action", choices=("list", "cache", "install", "rollback", "prune"))
+    packages.add_argument("version", nargs="?", default="latest", help="Versión de n8n (por defecto latest)")
+
+    subparsers.add_parser("alert-test", help="Enviar una alerta de prueba a todos los destinos configurados")
+
+    subparsers.add_parser("daemon", help="Ejecutar sin preguntas, con socket de control (systemd/contenedores)")
+
+    ctl = subparsers.add_parser("ctl", help="Enviar un comando al guardian en modo daemon")
+    ctl.add_argument("control_command", nargs="+", help=f"Comando: {', '.join(CONTROL_COMMANDS)}")
+    ctl.add_argument("--socket", help="Ruta del socket de control")
+
+    parser.add_argument("--config", help="Archivo de configuración JSON")
+    parser.add_argument("--trace", metavar="ARCHIVO", help="Guardar spans por fase en formato Chrome trace/Perfetto (JSON)")
+    parser.add_argument("--profile", metavar="ARCHIVO", help="Guardar un perfil cProfile de esta ejecución (.prof)")
+
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = load_config(args.config)
+
+    if args.command == "ctl":
+        socket_path = args.socket or config.get("control_socket") or (
+            Path(config["guardian_dir"] or Path.cwd() / "n8n_guardian_data") / "guardian.sock")
+        response = send_control_command(socket_path, " ".join(args.control_command))
+        if response is None:
+            print(f"❌ No se pudo contactar con el guardian en {socket_path}", file=sys.stderr)
+            return 2
+        print(json.dumps(response, indent=2, ensure_ascii=False))
+        return 0 if response.get("ok") else 1
+
+    if args.trace:
+        TRACER.enable()
+    profiler = None
+    if args.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    guardian = N8NGuardian(config, daemon=(args.command == "daemon"))
+    try:
+        return run_subcommand(guardian, args)
+    finally:
+        guardian.flush_alerts()
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+            print(f"📄 Perfil cProfile guardado en {args.profile} (ver con: python -m pstats {args.profile})", file=sys.stderr)
+        if args.trace:
+            count = TRACER.save(args.trace)
+            print(f"📄 Traza guardada en {args.trace} ({count} eventos, abrir en https://ui.perfetto.dev)", file=sys.stderr)
+
+def run_subcommand(guardian, args):
+    """Ejecutar el subcomando elegido; devuelve el código de salida"""
+    if args.command == "fleet":
+        checks = [c.strip() for c in args.checks.split(",")] if args.checks else None
+        report = guardian.run_fleet(args.inventory, checks=checks, parallel=args.parallel, json_output=args.json_output)
+        if not report:
+            return 2
+        metrics = report["metrics"]
+        all_healthy = "health" not in report["checks"] or metrics["healthy"] == metrics["instances"]
+        return 0 if metrics["with_errors"] == 0 and all_healthy else 1
+
+    if args.command == "db":
+        return 0 if guardian.show_database_stats() else 1
+
+    if args.command == "db-prune":
+        result = guardian.prune_database(args.older_than_days, args.time_budget, args.batch_size)
+        return 0 if result else 1
+
+    if args.command == "backup":
+        if args.action == "list":
+            guardian.list_backups()
+            return 0
+        if args.action == "restore":
+            if not args.snapshot:
+                print("❌ Indica el id del backup a restaurar (ver 'backup list')", file=sys.stderr)
+                return 2
+            return 0 if guardian.restore_backup(args.snapshot, args.target) else 1
+        return 0 if guardian.create_backup() else 1
+
+    if args.command == "packages":
+        if not PackageCache.SUPPORTED:
+            print("❌ La caché de paquetes solo está soportada en Linux/macOS", file=sys.stderr)
+            return 2
+        if args.action == "list":
+            guardian.list_packages()
+            return 0
+        if args.action in ("install", "rollback") and not guardian.managed_install:
+            print("❌ La caché de paquetes está desactivada: n8n se sigue lanzando desde la instalación global. "
+                  "Activa package_cache.enabled en la configuración", file=sys.stderr)
+            return 2
+        if args.action == "cache" and not guardian.managed_install:
+            guardian.log_and_print("⚠️ package_cache.enabled está desactivado: la versión se guarda, "
+                                   "pero no se usará hasta activarlo", "warning")
+        if args.action == "cache":
+            return 0 if guardian.cache_n8n_package(args.version) else 1
+        if args.action == "install":
+            current = guardian.packages.current()
+            if (not current or current[0] != args.version) and not guardian.backup_before_change("instalación"):
+                guardian.log_and_print("⏭️ Instalación cancelada", "info")
+                return 1
+            return 0 if guardian.install_from_cache(args.version) else 1
+        if args.action == "rollback":
+            return 0 if guardian.rollback_n8n() else 1
+        guardian.packages.prune()
+        guardian.list_packages()
+        return 0
+
+    if args.command == "alert-test":
+        if not guardian.alerts.sinks:
+            print("❌ No hay destinos de alertas configurados (alerts.sinks)", file=sys.stderr)
+            return 2
+        guardian.alerts.emit("test", "critical", "Alerta de prueba de N8N Guardian", fingerprint=f"test-{time.time()}")
+        guardian.flush_alerts()
+        stats = guardian.alerts.stats
+        print(f"📣 Alerta de prueba: {stats['sent']} envíos correctos, {stats['failed']} fallidos "
+              f"de {len(guardian.alerts.sinks)} destinos")
+        return 0 if stats["sent"] > 0 and stats["failed"] == 0 else 1
+
+    if args.command == "loadtest":
+        payload = json.loads(args.payload) if args.payload else None
+        report = guardian.run_loadtest(args.url, rate=args.rate, duration=args.duration,
+                                       connections=args.connections, payload=payload, sample_pid=args.pid)
+        return 0 if report and report["error_rate"] == 0 else 1
+
+    # Código distinto de cero si n8n no arrancó: systemd/el orquestador debe enterarse y reintentar
+    return 0 if guardian.run() else 1
+
 if __name__ == "__main__":
-    guardian = N8NGuardian()
-    guardian.run()
+    sys.exit(main())